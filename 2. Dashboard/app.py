@@ -1,23 +1,55 @@
 """Life Dashboard - main application entry point."""
 
-import json
-import os
-from datetime import datetime, timedelta
+import time
 
-import dash
-import dash_bootstrap_components as dbc
-import flask
-from apscheduler.schedulers.background import BackgroundScheduler
-from dash import html
-from dotenv import load_dotenv
+# Taken before the other imports on purpose: the time-to-ready log (warm_up)
+# reports how long they take, so they carry noqa: E402.
+_BOOT = time.perf_counter()
 
-from layouts import birthdays, finances, fitness, health, investments, learning, sleep
+import hashlib  # noqa: E402
+import logging  # noqa: E402
+import os  # noqa: E402
+import threading  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+from concurrent.futures import TimeoutError as FutureTimeout  # noqa: E402
+
+import dash  # noqa: E402
+import dash_bootstrap_components as dbc  # noqa: E402
+import flask  # noqa: E402
+from apscheduler.schedulers.background import BackgroundScheduler  # noqa: E402
+from dash import ClientsideFunction, Input, Output, State, dcc, html  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from flask_compress import Compress  # noqa: E402
+from plotly.io.json import to_json_plotly  # noqa: E402
+
+from layouts import birthdays, finances, fitness, health, investments, learning, sleep  # noqa: E402
+from modules import apple_health, ingest, leader, metrics, render_cache, retention, snapshots  # noqa: E402
+
+_IMPORTED = time.perf_counter()
 
 load_dotenv()
 
 # Data directory: /data in Docker, ../3. Data for local dev
 DATA_DIR = os.getenv("DATA_DIR", "../3. Data")
 
+# Cards are built concurrently; one slower than this shows its placeholder instead
+CARD_TIMEOUT_S = float(os.getenv("CARD_TIMEOUT_S", 5))
+CARD_WORKERS = int(os.getenv("CARD_WORKERS", 8))
+
+# Minutes between scheduled dashboard snapshots (see modules/snapshots.py)
+SNAPSHOT_INTERVAL_MIN = int(os.getenv("SNAPSHOT_INTERVAL_MIN", 30))
+
+# Progressive load: serve the page shell at once and let each card fill itself in
+# through its own callback, so first paint doesn't wait on the slowest data source
+PROGRESSIVE = os.getenv("DASHBOARD_PROGRESSIVE", "1") == "1"
+
+# Whichever process holds this lock runs the scheduler (see modules/leader.py)
+SCHEDULER_LOCK = os.path.join(DATA_DIR, ".scheduler.lock")
+
+# Response compression for JSON, JS and CSS; algorithms in order of preference
+COMPRESS = os.getenv("DASHBOARD_COMPRESS", "1") == "1"
+COMPRESS_ALGORITHM = os.getenv("COMPRESS_ALGORITHM", "br,gzip")
+
 
 # --- App ---
 
@@ -26,71 +58,231 @@ app = dash.Dash(
     external_stylesheets=[dbc.themes.DARKLY],
     title="Life Dashboard",
     update_title=None,
+    # Card contents (and their callback targets) arrive after the initial layout
+    suppress_callback_exceptions=True,
     meta_tags=[
         {"name": "viewport", "content": "width=device-width, initial-scale=1"}
     ],
 )
 server = app.server  # Expose Flask server for webhook routes
+server.logger.setLevel(logging.INFO)
+
+if COMPRESS:
+    server.config["COMPRESS_ALGORITHM"] = COMPRESS_ALGORITHM
+    Compress(server)
 
 
-# --- Helpers ---
+# --- Layout ---
 
-def week_label():
-    """Return a human-readable week range string for the dashboard header."""
-    today = datetime.now()
-    monday = today - timedelta(days=today.weekday())
-    sunday = monday + timedelta(days=6)
-    return f"{monday.strftime('%-d %b')} - {sunday.strftime('%-d %b %Y')}"
+CARDS = (health, sleep, fitness, finances, investments, learning, birthdays)
+HEALTH_CARDS = (health, sleep, learning)   # share one apple_health.query() pass
 
+_card_pool = ThreadPoolExecutor(max_workers=CARD_WORKERS, thread_name_prefix="card")
+_in_flight: dict = {}   # card name -> Future of the build still running for it
+_in_flight_lock = threading.Lock()
+
+
+def _once(fn):
+    """Thread-safe lazy fn(): the first caller runs it, the others wait for it."""
+    lock = threading.Lock()
+    result = []
+
+    def get():
+        with lock:
+            if not result:
+                result.append(fn())
+        return result[0]
+
+    return get
+
+
+_health_query: dict = {}   # "key" -> card_key of apple-health, "get" -> _once query for it
+_health_query_lock = threading.Lock()
+
+
+def _shared_health():
+    """The HEALTH_CARDS' batched apple_health.query(), as a _once() for the current data.
+
+    In PROGRESSIVE mode every card is built in its own callback request, so the
+    cards share the query through this rather than a single page render: it runs
+    once per data version (and day), however many requests ask.
+    """
+    key = render_cache.card_key(DATA_DIR, ("apple-health",))
+    with _health_query_lock:
+        if _health_query.get("key") != key:
+            _health_query["key"] = key
+            _health_query["get"] = _once(lambda: apple_health.query(
+                DATA_DIR, {k: v for module in HEALTH_CARDS for k, v in module.QUERY.items()}
+            ))
+        return _health_query["get"]
+
+
+def _with_shared_health():
+    """[(module, shared)] for every card; the Apple Health query runs at most once."""
+    health_data = _shared_health()
+    return [(module, health_data if module in HEALTH_CARDS else None)
+            for module in CARDS]
+
+
+def _placeholder(module, message):
+    return dbc.Card([
+        dbc.CardHeader(html.H5(module.TITLE)),
+        dbc.CardBody(html.P(message, className="placeholder-msg")),
+    ])
+
+
+def _card_name(module):
+    return module.__name__.rsplit(".", 1)[-1]
+
+
+def _card(module, shared=None):
+    """The card from the latest snapshot if still current, else _build_card()."""
+    snapped = snapshots.card(DATA_DIR, module.__name__, module.SOURCES)
+    if snapped is not None:
+        metrics.CARDS_SERVED.labels(card=_card_name(module), source="snapshot").inc()
+        return snapped
+    tree = _build_card(module, shared)
+    metrics.CARDS_SERVED.labels(card=_card_name(module), source="rendered").inc()
+    return tree
+
+
+def _build_card(module, shared=None):
+    """module.layout() via the render cache; rebuilt only when module.SOURCES change.
+
+    shared, if given, is called on a cache miss to supply data loaded once for
+    several cards.
+    """
+    def build():
+        with metrics.CARD_RENDER_SECONDS.labels(card=_card_name(module)).time():
+            if shared is None:
+                return module.layout(DATA_DIR)
+            return module.layout(DATA_DIR, shared())
+
+    return render_cache.render(module.__name__, DATA_DIR, module.SOURCES, build)
+
+
+def _submit_card(module, shared=None):
+    """Future for module's card: the build already running for it, else a new one.
+
+    A card whose source hangs therefore holds at most one pool thread; later
+    page loads wait on that build instead of queueing more behind it.
+    """
+    name = _card_name(module)
+    with _in_flight_lock:
+        future = _in_flight.get(name)
+        if future is None or future.done():
+            future = _card_pool.submit(_card, module, shared)
+            _in_flight[name] = future
+    return future
+
+
+def _mark_fallback():
+    """Note that this response carries a placeholder, so it must not get an ETag."""
+    if flask.has_request_context():
+        flask.g.card_fallback = True
+
+
+def _render_cards(cards):
+    """Build cards concurrently; return {module: component tree}.
+
+    Every card gets CARD_TIMEOUT_S from submission. A card that raises or runs
+    over gets its placeholder. An overrunning build keeps going in the pool and
+    fills the render cache; until it finishes, page loads share it rather than
+    starting another (_submit_card).
+    """
+    deadline = time.monotonic() + CARD_TIMEOUT_S
+    futures = {module: _submit_card(module, shared) for module, shared in cards}
+    out = {}
+    for module, future in futures.items():
+        try:
+            out[module] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            _mark_fallback()
+            metrics.CARD_FALLBACKS.labels(card=_card_name(module), reason="timeout").inc()
+            server.logger.warning("%s card timed out after %ss", module.__name__,
+                                  CARD_TIMEOUT_S)
+            out[module] = _placeholder(module, "Still loading -- refresh in a moment.")
+        except Exception:
+            _mark_fallback()
+            metrics.CARD_FALLBACKS.labels(card=_card_name(module), reason="error").inc()
+            server.logger.exception("%s card failed", module.__name__)
+            out[module] = _placeholder(module, "Couldn't load this card right now.")
+    return out
+
+
+def _slot_id(module):
+    return "card-" + _card_name(module)
+
+
+def _card_slot(module):
+    """Skeleton for a card that its callback replaces once the card is built."""
+    return dcc.Loading(
+        html.Div(_placeholder(module, "Loading..."), id=_slot_id(module)),
+        type="dot", color="#8b949e",
+    )
+
+
+def _register_card_callback(module):
+    # Clientside (assets/dashboard.js): fetches GET /api/cards/<name> into the slot
+    app.clientside_callback(
+        ClientsideFunction(namespace="dashboard", function_name="card"),
+        Output(_slot_id(module), "children"),
+        Input("url", "pathname"), State(_slot_id(module), "id"),
+    )
 
-# --- Layout ---
 
 def serve_layout():
-    """Called on every page request -- ensures fresh data is read from disk."""
+    """Called on every page request -- cards are rebuilt only when their data changed.
+
+    In PROGRESSIVE mode this returns only the shell; each card arrives through
+    its own callback (separate request), so cheap cards show before slow ones.
+    The week and "Generated" labels are filled in by the browser (assets/dashboard.js).
+    """
+    if PROGRESSIVE:
+        cards = {module: _card_slot(module) for module in CARDS}
+    else:
+        cards = _render_cards(_with_shared_health())
+
     return dbc.Container(
         [
+            dcc.Location(id="url"),
+
             # Header
             dbc.Row(
                 dbc.Col([
                     html.H1("Life Dashboard", className="text-center mt-4 mb-1"),
-                    html.P(
-                        f"Week of {week_label()}",
-                        className="text-center text-muted mb-3",
-                    ),
+                    html.P(id="week-label", className="text-center text-muted mb-3"),
                     html.Hr(),
                 ])
             ),
 
             # Row 1: Health (8 cols) + Sleep (4 cols)
             dbc.Row([
-                dbc.Col(health.layout(DATA_DIR), md=8, className="mb-4"),
-                dbc.Col(sleep.layout(DATA_DIR), md=4, className="mb-4"),
+                dbc.Col(cards[health], md=8, className="mb-4"),
+                dbc.Col(cards[sleep], md=4, className="mb-4"),
             ]),
 
             # Row 2: Fitness - full width (BJJ + Gym split inside the card)
             dbc.Row([
-                dbc.Col(fitness.layout(DATA_DIR), md=12, className="mb-4"),
+                dbc.Col(cards[fitness], md=12, className="mb-4"),
             ]),
 
             # Row 3: Finances (6 cols) + Investments (6 cols)
             dbc.Row([
-                dbc.Col(finances.layout(DATA_DIR), md=6, className="mb-4"),
-                dbc.Col(investments.layout(DATA_DIR), md=6, className="mb-4"),
+                dbc.Col(cards[finances], md=6, className="mb-4"),
+                dbc.Col(cards[investments], md=6, className="mb-4"),
             ]),
 
             # Row 4: Learning (8 cols) + Birthdays (4 cols)
             dbc.Row([
-                dbc.Col(learning.layout(DATA_DIR), md=8, className="mb-4"),
-                dbc.Col(birthdays.layout(DATA_DIR), md=4, className="mb-4"),
+                dbc.Col(cards[learning], md=8, className="mb-4"),
+                dbc.Col(cards[birthdays], md=4, className="mb-4"),
             ]),
 
             # Footer
             dbc.Row(
                 dbc.Col(
-                    html.P(
-                        f"Generated {datetime.now().strftime('%A %-d %B %Y, %-I:%M %p')}",
-                        className="text-center text-muted mt-2 mb-4",
-                    )
+                    html.P(id="generated-label", className="text-center text-muted mt-2 mb-4")
                 )
             ),
         ],
@@ -100,39 +292,274 @@ def serve_layout():
 
 app.layout = serve_layout
 
+app.clientside_callback(
+    ClientsideFunction(namespace="dashboard", function_name="labels"),
+    Output("week-label", "children"), Output("generated-label", "children"),
+    Input("url", "pathname"),
+)
+
+if PROGRESSIVE:
+    for _module in CARDS:
+        _register_card_callback(_module)
+
+health.register_callbacks(app, DATA_DIR)
+
+
+# --- HTTP caching ---
+# /_dash-layout and, in PROGRESSIVE mode, each card (GET /api/cards/<name>) get a
+# weak ETag built from the data versions they show (render_cache.card_key) and
+# _REVISION, so a refresh with nothing changed is answered 304 before any
+# rendering. The PROGRESSIVE shell holds no data, so its ETag only changes on
+# restart. Dash callbacks are POSTs and can't be revalidated, which is why cards
+# travel over GET. /_dash-dependencies only changes on restart, so it is hashed.
+# Weak validators also survive flask-compress, which rewrites strong ones.
+
+_LAYOUT_PATH = app.config.routes_pathname_prefix + "_dash-layout"
+_DEPENDENCIES_PATH = app.config.routes_pathname_prefix + "_dash-dependencies"
+
+# New on every start, so a deploy never leaves a browser on old layout code.
+# Taken at import, so gunicorn's workers (forked after preload) share it.
+_REVISION = time.time_ns()
+
+_CARDS_BY_NAME = {_card_name(module): module for module in CARDS}
+
+
+def _etag(parts):
+    return hashlib.sha1(repr([_REVISION, *parts]).encode()).hexdigest()[:20]
+
+
+def _layout_etag():
+    if PROGRESSIVE:
+        return _etag([PROGRESSIVE])
+    return _etag([render_cache.card_key(DATA_DIR, module.SOURCES) for module in CARDS])
+
+
+def _not_modified(etag):
+    response = flask.Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    return response
+
+
+@server.before_request
+def _layout_not_modified():
+    if flask.request.method != "GET" or flask.request.path != _LAYOUT_PATH:
+        return None
+    flask.g.layout_etag = _layout_etag()
+    if flask.request.if_none_match.contains_weak(flask.g.layout_etag):
+        return _not_modified(flask.g.layout_etag)
+    return None
+
+
+@server.route("/api/cards/<name>", methods=["GET"])
+def card_json(name):
+    """One card's component tree as JSON, for the PROGRESSIVE slots (assets/dashboard.js)."""
+    module = _CARDS_BY_NAME.get(name)
+    if module is None:
+        flask.abort(404)
+    etag = _etag([render_cache.card_key(DATA_DIR, module.SOURCES)])
+    if flask.request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    shared = _shared_health() if module in HEALTH_CARDS else None
+    response = flask.Response(to_json_plotly(_render_cards([(module, shared)])[module]),
+                              content_type="application/json")
+    response.cache_control.no_cache = True   # always revalidate, never serve stale
+    if not flask.g.get("card_fallback"):
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@server.after_request
+def _conditional_headers(response):
+    if flask.request.method != "GET" or response.status_code != 200:
+        return response
+    if flask.request.path == _LAYOUT_PATH and "layout_etag" in flask.g:
+        if flask.g.get("card_fallback"):
+            return response
+        response.set_etag(flask.g.layout_etag, weak=True)
+    elif flask.request.path == _DEPENDENCIES_PATH:
+        response.add_etag(weak=True)
+    else:
+        return response
+    response.cache_control.no_cache = True   # always revalidate, never serve stale
+    return response.make_conditional(flask.request)
+
+
+# --- Snapshots ---
+
+def write_snapshot():
+    """Render every card and save them as the latest on-disk snapshot."""
+    cards = {}
+    for module, shared in _with_shared_health():
+        stamp = snapshots.card_stamp(DATA_DIR, module.SOURCES)
+        try:
+            cards[module.__name__] = (stamp, _build_card(module, shared))
+        except Exception:
+            # Left out of the snapshot, so page loads render it live
+            server.logger.exception("%s card failed during snapshot", module.__name__)
+    try:
+        snapshots.write(DATA_DIR, cards)
+    except OSError:
+        server.logger.exception("Writing dashboard snapshot failed")
+
+
+# Snapshot runs triggered by webhooks; every worker has one, not just the leader
+_snapshot_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+
 
 # --- Apple Health Webhook ---
 
-@server.route("/api/health-export", methods=["POST"])
-def health_export():
-    """Receives JSON POST from Health Auto Export iOS app and saves to disk."""
-    data = flask.request.get_json(force=True, silent=True)
-    if data is None:
-        return flask.jsonify({"status": "error", "message": "no JSON body"}), 400
+def _error(message, status):
+    return flask.jsonify({"status": "error", "message": message}), status
 
-    out_dir = os.path.join(DATA_DIR, "apple-health")
-    os.makedirs(out_dir, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-    out_path = os.path.join(out_dir, f"export_{timestamp}.json")
+def _snapshot_after_ingest(_path):
+    # Re-render in the background so the next page load is served from disk
+    _snapshot_pool.submit(write_snapshot)
 
-    with open(out_path, "w") as f:
-        json.dump(data, f, indent=2)
 
-    return flask.jsonify({"status": "ok", "saved": out_path}), 200
+@server.route("/api/health-export", methods=["POST"])
+@metrics.timed(metrics.WEBHOOK_SECONDS)
+def health_export():
+    """Receives JSON POST from Health Auto Export iOS app and queues it for saving.
+
+    The body (gunzipped if `Content-Encoding: gzip`) is streamed to a spool file
+    rather than read into memory, and answered 202 with an ingest id once it is
+    on disk; the writer in modules/ingest.py parses, saves and folds it, so
+    malformed JSON shows up as "failed" on the status route. 413 over
+    INGEST_MAX_BODY_MB, 429 when the queue is full.
+    """
+    request = flask.request
+    if (request.content_length or 0) > ingest.MAX_BODY_BYTES:
+        return _error("payload too large", 413)
+    if ingest.full():
+        response, status = _error("ingest queue full", 429)
+        response.headers["Retry-After"] = "30"
+        return response, status
+
+    ingest_id = ingest.new_ingest_id()
+    try:
+        spooled = ingest.spool(DATA_DIR, ingest_id, request.stream,
+                               gzipped=request.content_encoding == "gzip")
+    except ingest.PayloadTooLarge:
+        return _error("payload too large", 413)
+    except ValueError as exc:
+        return _error(str(exc), 400)
+
+    if not ingest.submit(DATA_DIR, ingest_id, spooled, on_saved=_snapshot_after_ingest):
+        response, status = _error("ingest queue full", 429)
+        response.headers["Retry-After"] = "30"
+        return response, status
+
+    return flask.jsonify({
+        "status": "queued",
+        "ingest_id": ingest_id,
+    }), 202
+
+
+def start_ingest_recovery():
+    """Queue, in the background, webhook bodies a dead process accepted but never saved."""
+    threading.Thread(
+        target=ingest.recover, args=(DATA_DIR, _snapshot_after_ingest),
+        name="ingest-recover", daemon=True,
+    ).start()
+
+
+@server.route("/api/health-export/<ingest_id>", methods=["GET"])
+def health_export_status(ingest_id):
+    """Where a queued payload has got to: queued, saved, duplicate (nothing new) or failed."""
+    state = ingest.status(DATA_DIR, ingest_id)
+    if state is None:
+        return _error("unknown ingest id", 404)
+    return flask.jsonify({"ingest_id": ingest_id, "status": state}), 200
+
+
+@server.after_request
+def _count_webhook(response):
+    if flask.request.path == "/api/health-export":
+        metrics.WEBHOOK_REQUESTS.labels(status=str(response.status_code)).inc()
+        metrics.WEBHOOK_BYTES_RECEIVED.inc(flask.request.content_length or 0)
+    return response
+
+
+# --- Metrics ---
+
+@server.route("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition of the counters and histograms in modules/metrics.py."""
+    body, content_type = metrics.exposition()
+    return flask.Response(body, content_type=content_type)
 
 
 # --- Scheduler ---
 # Timezone: Australia/Melbourne (Zach's local timezone)
 # Data sync jobs are added here as each module is built.
+# Only one process runs them: start_scheduler() is called by `python app.py` and,
+# under gunicorn, by every worker after fork (gunicorn.conf.py); the leader wins.
 
 scheduler = BackgroundScheduler(timezone="Australia/Melbourne")
-scheduler.start()
+
+# Fold the day's Apple Health exports into the columnar store
+scheduler.add_job(
+    apple_health.compact_exports, "cron", hour=3, args=[DATA_DIR],
+    id="apple_health_compact", replace_existing=True,
+)
+
+# Roll exports from months past APPLE_HEALTH_RETENTION_DAYS into monthly archives
+scheduler.add_job(
+    retention.run, "cron", hour=3, minute=30, args=[DATA_DIR],
+    id="apple_health_retention", replace_existing=True,
+)
+
+# Re-render the dashboard snapshot; webhook ingests also trigger one immediately
+scheduler.add_job(
+    write_snapshot, "interval", minutes=SNAPSHOT_INTERVAL_MIN,
+    id="dashboard_snapshot", replace_existing=True,
+)
+
+
+def start_scheduler():
+    """Start the scheduler if this process is the leader; return whether it runs here."""
+    if scheduler.running:
+        return True
+    if not leader.acquire(SCHEDULER_LOCK):
+        server.logger.info("Scheduler runs in another process (pid %d)", os.getpid())
+        return False
+    scheduler.start()
+    return True
+
+
+# --- Warm-up ---
+# Importing is only part of a cold start: the first render also loads the health
+# store, builds Plotly's validators and fills the render cache. warm_up() does
+# that in the background at boot so the first page request finds it all ready.
+
+def warm_up():
+    """Render every card once (from the snapshot if current) and log time-to-ready."""
+    start = time.perf_counter()
+    for module, shared in _with_shared_health():
+        try:
+            _card(module, shared)
+        except Exception:
+            server.logger.exception("%s card failed during warm-up", module.__name__)
+    done = time.perf_counter()
+    server.logger.info(
+        "Ready: imports %.2fs, warm-up %.2fs, %.2fs since start (pid %d)",
+        _IMPORTED - _BOOT, done - start, done - _BOOT, os.getpid(),
+    )
+
+
+def start_warm_up():
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 
 # --- Run ---
+# Development server. Production: gunicorn (see gunicorn.conf.py and Dockerfile).
 
 if __name__ == "__main__":
+    start_scheduler()
+    start_warm_up()
+    start_ingest_recovery()
     port = int(os.getenv("DASHBOARD_PORT", 8050))
     host = os.getenv("DASHBOARD_HOST", "0.0.0.0")
     app.run(host=host, port=port, debug=False)
@@ -0,0 +1,49 @@
+/* Life Dashboard - clientside callbacks (registered in app.py) */
+
+(function () {
+    var DAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"];
+    var MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+                  "August", "September", "October", "November", "December"];
+
+    function dayMonth(date) {
+        // "%-d %b", e.g. "6 Oct"
+        return date.getDate() + " " + MONTHS[date.getMonth()].slice(0, 3);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dashboard: {
+            // Header week range and footer time, worked out in the browser so the
+            // served layout holds nothing time-dependent and its ETag only changes
+            // with the data.
+            labels: function (_pathname) {
+                var now = new Date();
+                var monday = new Date(now.getFullYear(), now.getMonth(),
+                                      now.getDate() - (now.getDay() + 6) % 7);
+                var sunday = new Date(monday.getFullYear(), monday.getMonth(),
+                                      monday.getDate() + 6);
+                var hour = now.getHours() % 12 || 12;
+                var minute = String(now.getMinutes()).padStart(2, "0");
+                return [
+                    "Week of " + dayMonth(monday) + " - " + dayMonth(sunday) + " " +
+                        sunday.getFullYear(),
+                    "Generated " + DAYS[now.getDay()] + " " + now.getDate() + " " +
+                        MONTHS[now.getMonth()] + " " + now.getFullYear() + ", " + hour +
+                        ":" + minute + " " + (now.getHours() < 12 ? "AM" : "PM"),
+                ];
+            },
+
+            // One card's component tree from GET /api/cards/<name>. A plain GET, so
+            // the browser revalidates it with its ETag and unchanged cards cost a 304.
+            card: function (_pathname, slotId) {
+                return fetch("/api/cards/" + slotId.replace(/^card-/, ""), {
+                    credentials: "same-origin",
+                }).then(function (response) {
+                    if (!response.ok) {
+                        throw new Error("card " + slotId + ": HTTP " + response.status);
+                    }
+                    return response.json();
+                });
+            },
+        },
+    });
+})();
@@ -0,0 +1,78 @@
+"""Report serialized bytes per dashboard figure and flag any over budget.
+
+Renders every card against synthetic Apple Health data (benchmarks/synthetic.py),
+finds each dcc.Graph in the component trees and measures its figure as it goes
+over the wire (plotly JSON, uncompressed). Exits 1 if any figure exceeds the
+budget, so it can gate a change that adds or restyles charts.
+
+Usage (from 2. Dashboard/):
+    python -m benchmarks.figure_budget
+    python -m benchmarks.figure_budget --budget 3000 --days 365
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+
+from dash import dcc
+from plotly.io.json import to_json_plotly
+
+from benchmarks import synthetic
+from layouts import birthdays, finances, fitness, health, investments, learning, sleep
+from modules import apple_health
+
+CARDS = (health, sleep, fitness, finances, investments, learning, birthdays)
+BUDGET_BYTES = 4096
+
+
+def iter_figures(component):
+    """Yield every figure under a Dash component tree."""
+    if isinstance(component, dcc.Graph):
+        yield component.figure
+    children = getattr(component, "children", None)
+    if children is None:
+        return
+    for child in children if isinstance(children, (list, tuple)) else [children]:
+        yield from iter_figures(child)
+
+
+def figure_sizes(data_dir):
+    """[(card name, figure index, bytes, template bytes)] for every figure."""
+    rows = []
+    for module in CARDS:
+        tree = module.layout(data_dir)
+        for i, figure in enumerate(iter_figures(tree)):
+            fig_json = figure.to_plotly_json() if hasattr(figure, "to_plotly_json") else figure
+            template = fig_json.get("layout", {}).get("template", {})
+            rows.append((module.__name__.rsplit(".", 1)[-1], i,
+                         len(to_json_plotly(fig_json)), len(to_json_plotly(template))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=int, default=BUDGET_BYTES, help="bytes per figure")
+    parser.add_argument("--days", type=int, default=90, help="synthetic history")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="figure-budget-")
+    try:
+        synthetic.generate(work_dir, days=args.days, files=args.days)
+        rows = figure_sizes(work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        apple_health.clear_caches()
+
+    over = 0
+    print(f"{'card':12} {'fig':>3} {'bytes':>7} {'template':>9}")
+    for card, i, size, template in rows:
+        flag = "  OVER BUDGET" if size > args.budget else ""
+        over += bool(flag)
+        print(f"{card:12} {i:3d} {size:7d} {template:9d}{flag}")
+    print(f"{len(rows)} figures, {over} over the {args.budget}-byte budget")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measure dashboard response sizes: raw, compressed and on revalidation.
+
+Renders the dashboard against synthetic Apple Health data (benchmarks/synthetic.py)
+through Flask's test client and reports the bytes sent for the layout (progressive
+shell and fully server-rendered), the callback dependencies and each card as the
+progressive shell fetches it (GET /api/cards/<name>) with no compression, gzip
+and brotli, plus what a refresh with an unchanged dashboard costs (a 304 with no
+body).
+
+Usage (from 2. Dashboard/):
+    python -m benchmarks.http_payloads
+    python -m benchmarks.http_payloads --days 90
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchmarks import synthetic
+
+ENCODINGS = ("identity", "gzip", "br")
+
+
+def _sizes(client, path):
+    """{encoding: body bytes} plus the 304 size on revalidation."""
+    out = {}
+    for encoding in ENCODINGS:
+        response = client.get(path, headers={"Accept-Encoding": encoding})
+        out[encoding] = len(response.get_data())
+    etag = response.headers.get("ETag")
+    if etag:
+        again = client.get(path, headers={"If-None-Match": etag, "Accept-Encoding": "br"})
+        out["revalidate"] = len(again.get_data()) if again.status_code == 304 else None
+    return out
+
+
+def run(data_dir):
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["DASHBOARD_PROGRESSIVE"] = "1"
+    os.environ["DASHBOARD_COMPRESS"] = "1"
+    import app   # reads the environment at import
+
+    client = app.server.test_client()
+    rows = {}
+    rows["layout (shell)"] = _sizes(client, app._LAYOUT_PATH)
+    app.PROGRESSIVE = False
+    rows["layout (full)"] = _sizes(client, app._LAYOUT_PATH)
+    app.PROGRESSIVE = True
+    rows["dependencies"] = _sizes(client, app._DEPENDENCIES_PATH)
+    for name in app._CARDS_BY_NAME:
+        rows[f"card {name}"] = _sizes(client, f"/api/cards/{name}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365, help="synthetic history")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="http-bench-")
+    try:
+        synthetic.generate(work_dir, days=args.days, files=args.days)
+        rows = run(work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'response':24} {'raw':>8} {'gzip':>14} {'br':>14} {'304':>6}")
+    for name, sizes in rows.items():
+        raw = sizes["identity"]
+        cells = [f"{sizes[enc]:7d} {100 * (1 - sizes[enc] / raw):4.0f}%" for enc in ("gzip", "br")]
+        revalidate = sizes.get("revalidate")
+        print(f"{name:24} {raw:8d} {cells[0]:>14} {cells[1]:>14} "
+              f"{'-' if revalidate is None else revalidate:>6}")
+    total = {enc: sum(sizes[enc] for sizes in rows.values()) for enc in ENCODINGS}
+    print(f"{'total':24} {total['identity']:8d} {total['gzip']:14d} {total['br']:14d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Benchmark the Apple Health pipeline on synthetic exports.
+
+For each scale (years of daily exports, see benchmarks/synthetic.py) this times
+load_all_exports(), each get_* function and the dashboard's batched query(), and
+records peak traced memory, in four cache states:
+
+    cold       - nothing cached: no sidecars or store (first boot)
+    restart    - sidecars on disk, empty process (after a redeploy)
+    compacted  - every export folded into the store, empty process
+    warm       - second call in the same process, nothing changed on disk
+
+Wall time is measured without tracemalloc (it slows allocation-heavy code), then
+the call is repeated under tracemalloc for the peak. Results are written as JSON;
+pass --compare with an earlier file to print the change.
+
+Usage (from 2. Dashboard/):
+    python -m benchmarks.run                      # 1, 3 and 10 years
+    python -m benchmarks.run --years 1 --compare benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks import synthetic
+from layouts import health, learning, sleep
+from modules import apple_health, health_store
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+MODES = ("cold", "restart", "compacted", "warm")
+
+DASHBOARD_QUERY = {**health.QUERY, **sleep.QUERY, **learning.QUERY}
+TARGETS = {
+    "load_all_exports": lambda d: apple_health.load_all_exports(d),
+    "get_body_composition": lambda d: apple_health.get_body_composition(d),
+    "get_calories": lambda d: apple_health.get_calories(d),
+    "get_sleep": lambda d: apple_health.get_sleep(d),
+    "get_study_hours": lambda d: apple_health.get_study_hours(d),
+    "query": lambda d: apple_health.query(d, DASHBOARD_QUERY),
+}
+
+
+def _reset_disk(data_dir):
+    """Remove everything the pipeline derives from the raw exports."""
+    ah_dir = os.path.join(data_dir, "apple-health")
+    shutil.rmtree(apple_health.cache_dir(ah_dir), ignore_errors=True)
+    shutil.rmtree(health_store.store_dir(ah_dir), ignore_errors=True)
+
+
+def _prepare(mode, data_dir, fn):
+    """Put disk and memory into the state `mode` describes before calling fn."""
+    if mode == "cold":
+        _reset_disk(data_dir)
+    elif mode == "restart":
+        _reset_disk(data_dir)
+        apple_health.load_metrics(data_dir)   # writes sidecars
+    elif mode == "compacted":
+        _reset_disk(data_dir)
+        apple_health.compact_exports(data_dir)
+    apple_health.clear_caches()
+    if mode == "warm":
+        fn(data_dir)
+
+
+def _measure(mode, data_dir, fn, repeat):
+    seconds = []
+    for _ in range(repeat):
+        _prepare(mode, data_dir, fn)
+        start = time.perf_counter()
+        fn(data_dir)
+        seconds.append(time.perf_counter() - start)
+
+    _prepare(mode, data_dir, fn)
+    tracemalloc.start()
+    try:
+        fn(data_dir)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(min(seconds), 6), "peak_mb": round(peak / 2**20, 3)}
+
+
+def run_scale(years, work_dir, modes, repeat):
+    data_dir = os.path.join(work_dir, f"{years}y")
+    days = int(365 * years)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    dataset = synthetic.generate(data_dir, days=days, files=days)
+    print(f"{years}y: {dataset['files']} files, {dataset['bytes'] / 2**20:.1f} MB",
+          file=sys.stderr)
+
+    results = {}
+    for mode in modes:
+        results[mode] = {}
+        for name, fn in TARGETS.items():
+            results[mode][name] = _measure(mode, data_dir, fn, repeat)
+            print(f"  {mode:10} {name:22} {results[mode][name]['seconds']:9.4f}s "
+                  f"{results[mode][name]['peak_mb']:9.2f} MB", file=sys.stderr)
+    apple_health.clear_caches()
+    return {"dataset": dataset, "results": results}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """Print seconds and peak MB side by side for every entry both runs share."""
+    print(f"{'scale':6} {'mode':10} {'target':22} {'seconds':>22} {'peak MB':>22}")
+    for scale, run in current["scales"].items():
+        old_run = previous.get("scales", {}).get(scale)
+        if old_run is None:
+            continue
+        for mode, targets in run["results"].items():
+            for name, new in targets.items():
+                old = old_run["results"].get(mode, {}).get(name)
+                if old is None:
+                    continue
+                cells = []
+                for key in ("seconds", "peak_mb"):
+                    ratio = new[key] / old[key] if old[key] else float("nan")
+                    cells.append(f"{old[key]:8.3f} -> {new[key]:8.3f} x{ratio:4.2f}")
+                print(f"{scale:6} {mode:10} {name:22} {cells[0]:>22} {cells[1]:>22}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 3, 10])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--repeat", type=int, default=1, help="timing runs; the best is kept")
+    parser.add_argument("--work-dir", help="where synthetic data is written (default: temp dir)")
+    parser.add_argument("--out", help="results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="health-bench-")
+    try:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": {
+                f"{years:g}y": run_scale(years, work_dir, args.modes, args.repeat)
+                for years in args.years
+            },
+        }
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Profile dashboard cold start: import time of app.py and time-to-ready.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter and lists the
+slowest top-level imports, then times a second fresh process through import and
+app.warm_up() against synthetic Apple Health data (benchmarks/synthetic.py).
+
+Usage (from 2. Dashboard/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --top 25 --days 365
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import synthetic
+
+_READY_SCRIPT = """
+import json, time
+import app
+app.scheduler.remove_all_jobs()
+start = time.perf_counter()
+app.warm_up()
+print(json.dumps({"imports": app._IMPORTED - app._BOOT,
+                  "warm_up": time.perf_counter() - start,
+                  "ready": time.perf_counter() - app._BOOT}))
+"""
+
+
+def import_times(env):
+    """[(cumulative seconds, self seconds, module)] for app's direct imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split(":", 1)[1].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue   # header line
+        self_us, cumulative_us, name = fields
+        # Nesting is shown by indentation; 3 spaces = imported directly by app.py
+        if len(name) - len(name.lstrip(" ")) == 3:
+            rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)
+
+
+def time_to_ready(env):
+    proc = subprocess.run([sys.executable, "-c", _READY_SCRIPT], env=env,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="imports to list")
+    parser.add_argument("--days", type=int, default=365, help="synthetic history")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="startup-bench-")
+    try:
+        synthetic.generate(work_dir, days=args.days, files=args.days)
+        env = {**os.environ, "DATA_DIR": work_dir}
+        imports = import_times(env)
+        ready = time_to_ready(env)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'import':40} {'cumulative':>10} {'self':>8}")
+    for cumulative, own, name in imports[:args.top]:
+        print(f"{name:40} {cumulative:9.3f}s {own:7.3f}s")
+    print(f"\nimports {ready['imports']:.2f}s, warm-up {ready['warm_up']:.2f}s, "
+          f"ready {ready['ready']:.2f}s after start")
+
+
+if __name__ == "__main__":
+    main()
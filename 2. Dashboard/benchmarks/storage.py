@@ -0,0 +1,89 @@
+"""Compare export storage formats: bytes on disk and time to load them.
+
+Writes the same synthetic history (benchmarks/synthetic.py) once per format --
+the original indent=2 JSON and the compact plain/gzip/zstd files modules/ingest.py
+writes -- then times a cold apple_health.load_metrics() (no sidecars or store,
+empty process caches) and compact_exports() over each.
+
+Usage (from 2. Dashboard/):
+    python -m benchmarks.storage
+    python -m benchmarks.storage --days 730 --repeat 3
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from benchmarks.run import _reset_disk
+from modules import apple_health
+
+FORMATS = {           # label -> synthetic.write_export compression
+    "indent=2 json": None,
+    "compact json": "none",
+    "gzip": "gzip",
+    "zstd": "zstd",
+}
+
+
+def _available(compression):
+    if compression != "zstd":
+        return True
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _best_of(repeat, data_dir, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        _reset_disk(data_dir)
+        apple_health.clear_caches()
+        start = time.perf_counter()
+        fn(data_dir)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(days, work_dir, repeat):
+    rows = {}
+    for label, compression in FORMATS.items():
+        if not _available(compression):
+            print(f"{label}: skipped (zstandard not installed)")
+            continue
+        data_dir = os.path.join(work_dir, label.replace(" ", "_"))
+        info = synthetic.generate(data_dir, days=days, files=days, compression=compression)
+        rows[label] = {
+            "bytes": info["bytes"],
+            "load_metrics": _best_of(repeat, data_dir, apple_health.load_metrics),
+            "compact_exports": _best_of(repeat, data_dir, apple_health.compact_exports),
+        }
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=365, help="one export per day")
+    parser.add_argument("--repeat", type=int, default=1, help="timing runs; the best is kept")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="storage-bench-")
+    try:
+        rows = run(args.days, work_dir, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    base = rows["indent=2 json"]
+    print(f"{'format':14} {'MB on disk':>11} {'vs json':>8} {'load_metrics':>13} {'compact':>9}")
+    for label, row in rows.items():
+        print(f"{label:14} {row['bytes'] / 2**20:11.2f} {row['bytes'] / base['bytes']:7.2f}x "
+              f"{row['load_metrics']:12.3f}s {row['compact_exports']:8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Synthetic Health Auto Export payloads for benchmarking.
+
+generate() writes export_<timestamp>.json files into <data_dir>/apple-health/ the
+way the /api/health-export webhook saves them. Like Health Auto Export's daily
+auto-export, every file resends the last `window` days, so files overlap and the
+same reading appears in several of them (with the same value, as a real resend
+would).
+
+Covers every metric in apple_health._METRIC plus the legacy mindful_session name:
+    body_mass, body_fat_percentage, lean_body_mass  - one morning weigh-in a day,
+                                                      sometimes an evening one too
+    dietary_energy_consumed                         - one daily total
+    sleep_analysis                                  - one night (with stage fields),
+                                                      sometimes a nap
+    mindful_minutes / mindful_session               - 0-4 study sessions a day
+
+Usage (from 2. Dashboard/):
+    python -m benchmarks.synthetic /tmp/health-bench --days 365 --files 365
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+from modules import ingest
+
+UNITS = {
+    "body_mass": "kg",
+    "body_fat_percentage": "%",
+    "lean_body_mass": "kg",
+    "dietary_energy_consumed": "kcal",
+    "sleep_analysis": "hr",
+    "mindful_minutes": "min",
+    "mindful_session": "min",
+}
+
+
+def _stamp(dt):
+    # Melbourne: +1100 in daylight saving (Oct-Mar), +1000 otherwise
+    offset = "+1100" if dt.month in (10, 11, 12, 1, 2, 3) else "+1000"
+    return dt.strftime("%Y-%m-%d %H:%M:%S ") + offset
+
+
+def day_entries(day, seed=0):
+    """All readings for one calendar day, identical whichever file resends them."""
+    rng = random.Random(f"{seed}-{day.toordinal()}")
+    base = datetime(day.year, day.month, day.day)
+    weight = 72.0 - day.toordinal() % 365 / 365 * 2 + rng.uniform(-0.6, 0.6)
+    bf = 14.0 + rng.uniform(-0.8, 0.8)
+    entries = {name: [] for name in UNITS}
+
+    weigh_ins = [base + timedelta(hours=7, minutes=rng.randrange(60))]
+    if rng.random() < 0.2:
+        weigh_ins.append(base + timedelta(hours=20, minutes=rng.randrange(60)))
+    for t in weigh_ins:
+        entries["body_mass"].append({"date": _stamp(t), "qty": round(weight, 2),
+                                     "source": "Withings"})
+        entries["body_fat_percentage"].append({"date": _stamp(t), "qty": round(bf, 1),
+                                               "source": "Withings"})
+        entries["lean_body_mass"].append({"date": _stamp(t),
+                                          "qty": round(weight * (1 - bf / 100), 2),
+                                          "source": "Withings"})
+
+    entries["dietary_energy_consumed"].append({
+        "date": _stamp(base), "qty": round(rng.gauss(2300, 250), 1),
+        "source": "MyFitnessPal",
+    })
+
+    core, deep, rem = rng.uniform(3, 4.5), rng.uniform(0.6, 1.4), rng.uniform(1, 2)
+    awake = rng.uniform(0.1, 0.6)
+    wake = base + timedelta(hours=6, minutes=rng.randrange(90))
+    sleep_start = wake - timedelta(hours=core + deep + rem + awake)
+    entries["sleep_analysis"].append({
+        "date": _stamp(wake),
+        "totalSleep": round(core + deep + rem, 3),
+        "asleep": 0,
+        "core": round(core, 3), "deep": round(deep, 3), "rem": round(rem, 3),
+        "awake": round(awake, 3),
+        "inBed": round(core + deep + rem + awake, 3),
+        "sleepStart": _stamp(sleep_start), "sleepEnd": _stamp(wake),
+        "inBedStart": _stamp(sleep_start), "inBedEnd": _stamp(wake),
+        "source": "Apple Watch",
+    })
+    if rng.random() < 0.1:
+        entries["sleep_analysis"].append({
+            "date": _stamp(base + timedelta(hours=15)),
+            "asleep": round(rng.uniform(0.3, 1.2), 3), "qty": 1.0,
+            "source": "Apple Watch",
+        })
+
+    for k in range(rng.randrange(5)):
+        name = "mindful_session" if rng.random() < 0.1 else "mindful_minutes"
+        start = base + timedelta(hours=8 + 3 * k, minutes=rng.randrange(120))
+        entries[name].append({"date": _stamp(start), "qty": float(rng.randrange(15, 90)),
+                              "source": "Forest"})
+    return entries
+
+
+def payload(first_day, last_day, seed=0):
+    """One export body covering first_day..last_day inclusive."""
+    data = {name: [] for name in UNITS}
+    day = first_day
+    while day <= last_day:
+        for name, entries in day_entries(day, seed).items():
+            data[name].extend(entries)
+        day += timedelta(days=1)
+    return {"data": {"metrics": [
+        {"name": name, "units": UNITS[name], "data": entries}
+        for name, entries in data.items() if entries
+    ]}}
+
+
+def write_export(ah_dir, sent, body, compression=None):
+    """Save a payload the way the webhook does. Returns the path.
+
+    compression None writes the original format (indent=2 plain JSON); "none",
+    "gzip" or "zstd" write what modules/ingest.py writes today.
+    """
+    if compression is not None:
+        return ingest.write_export(ah_dir, sent.strftime("%Y-%m-%dT%H-%M-%S"), body,
+                                   compression)
+    path = os.path.join(ah_dir, sent.strftime("export_%Y-%m-%dT%H-%M-%S.json"))
+    with open(path, "w") as f:
+        json.dump(body, f, indent=2)
+    return path
+
+
+def generate(data_dir, days, files, window=7, seed=0, end=None, compression=None):
+    """Write `files` overlapping exports covering the `days` days up to `end`.
+
+    Returns:
+        dict: {"files": int, "bytes": int, "days": int, "window": int}
+    """
+    ah_dir = os.path.join(data_dir, "apple-health")
+    os.makedirs(ah_dir, exist_ok=True)
+    end = end or datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+
+    total_bytes = 0
+    for i in range(files):
+        # Spread sends evenly; the seconds keep filenames unique when files > days
+        sent = start + timedelta(days=(i + 1) * days / files, seconds=i)
+        last_day = min(sent.date(), end.date())
+        first_day = last_day - timedelta(days=window - 1)
+        path = write_export(ah_dir, sent, payload(first_day, last_day, seed), compression)
+        total_bytes += os.path.getsize(path)
+    return {"files": files, "bytes": total_bytes, "days": days, "window": window}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", help="written to <data_dir>/apple-health/")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--files", type=int, help="default: one per day")
+    parser.add_argument("--window", type=int, default=7, help="days resent per file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    info = generate(args.data_dir, args.days, args.files or args.days, args.window, args.seed)
+    print(json.dumps(info))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""gunicorn settings for production serving (used by the Dockerfile).
+
+    gunicorn app:server
+
+The app is imported once in the master (preload_app) and forked into the
+workers, so they share its memory. The scheduler is not started at import; each
+worker calls app.start_scheduler() after forking and only the one that takes
+the leader lock runs it, so jobs never run twice. Each worker also warms its
+caches in the background (app.start_warm_up) so its first request isn't cold,
+and queues any webhook body a dead worker spooled but never saved
+(app.start_ingest_recovery).
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+bind = f"{os.getenv('DASHBOARD_HOST', '0.0.0.0')}:{os.getenv('DASHBOARD_PORT', 8050)}"
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+# Threads per worker: progressive page loads fire one callback per card at once
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+accesslog = "-"
+
+# Workers write metric samples here so /metrics can sum them (modules/metrics.py).
+# Set before the app is loaded: prometheus_client picks its storage at import.
+# A directory the operator set is used as is -- emptying it between runs is up to
+# them; otherwise a fresh private one is made, so it starts empty.
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+else:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="dashboard-metrics-")
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    import app
+
+    if app.start_scheduler():
+        server.log.info("Worker %s owns the scheduler", worker.pid)
+    app.start_warm_up()
+    app.start_ingest_recovery()
@@ -0,0 +1,15 @@
+"""Dashboard cards, one module per card; app.py places them in the grid.
+
+Every card module defines:
+
+    TITLE                 - card header, also shown on the card's fallback placeholder
+    SOURCES               - directories under DATA_DIR the card reads; its cached
+                            render and snapshot are keyed on their data versions
+                            (modules/render_cache.py)
+    layout(data_dir)      - build the card (a dbc.Card) from the data on disk
+
+Cards that read Apple Health also define QUERY, the apple_health.query() specs
+they need, and take layout(data_dir, data=None): serve_layout batches the QUERY
+of all of them into one query per request and passes the result as `data`.
+Called without it, a card runs its own query.
+"""
@@ -5,10 +5,13 @@ Placeholder. Replace with real content when building the Google Calendar module.
 import dash_bootstrap_components as dbc
 from dash import html
 
+TITLE = "Upcoming Birthdays"
+SOURCES = ("google-calendar",)
+
 
 def layout(data_dir):
     return dbc.Card([
-        dbc.CardHeader(html.H5("Upcoming Birthdays")),
+        dbc.CardHeader(html.H5(TITLE)),
         dbc.CardBody(
             html.P(
                 "Birthdays -- Google Calendar module not yet connected.",
@@ -5,10 +5,13 @@ Placeholder. Replace with real content when building the Finances module.
 import dash_bootstrap_components as dbc
 from dash import html
 
+TITLE = "Finances"
+SOURCES = ("finances",)
+
 
 def layout(data_dir):
     return dbc.Card([
-        dbc.CardHeader(html.H5("Finances")),
+        dbc.CardHeader(html.H5(TITLE)),
         dbc.CardBody(
             html.P(
                 "Weekly spending -- Up Bank module not yet connected.",
@@ -6,10 +6,13 @@ The card is split into two panels: BJJ (left) and Gym Volume (right).
 import dash_bootstrap_components as dbc
 from dash import html
 
+TITLE = "Fitness"
+SOURCES = ("google-calendar", "strava")
+
 
 def layout(data_dir):
     return dbc.Card([
-        dbc.CardHeader(html.H5("Fitness")),
+        dbc.CardHeader(html.H5(TITLE)),
         dbc.CardBody(
             dbc.Row([
                 dbc.Col(
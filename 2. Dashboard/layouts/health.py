@@ -2,29 +2,44 @@
 
 Shows:
   - Stats row: current weight, body fat %, lean mass
-  - Weight trend line chart (28 days) with 70 kg target line
+  - Weight trend line chart with 70 kg target line: 28 days, 1 year or all time,
+    downsampled to the visible window and re-queried on zoom (register_callbacks)
   - Daily calories bar chart (7 days)
 
-Calls modules/apple_health.py at render time (data read from disk).
+Calls modules/apple_health.py at render time (data read from disk), or takes the
+frames from a batched apple_health.query() passed in by serve_layout.
 Returns placeholder content if no data files exist yet.
 """
 
+from datetime import datetime, timedelta
+
+import pandas as pd
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
-from dash import html, dcc
+from dash import Input, Output, ctx, dcc, html, no_update
 
-from modules import apple_health
+from layouts.theme import COLOR_BLUE, COLOR_GREEN, COLOR_ORANGE, TEMPLATE
+from modules import apple_health, downsample
 
-# --- Visual constants ---
 TARGET_WEIGHT_KG = 70.0
 TARGET_BF_PCT = 12.0
-CHART_PAPER_BG = "rgba(0,0,0,0)"
-CHART_PLOT_BG = "rgba(0,0,0,0)"
-CHART_FONT_COLOR = "#8b949e"
-CHART_GRID_COLOR = "#21262d"
-COLOR_BLUE = "#58a6ff"
-COLOR_GREEN = "#3fb950"
-COLOR_ORANGE = "#d29922"
+
+# Weight chart views (days back; None = all time) and the most points it ships.
+# The default view is the daily weights of QUERY["body_composition"]; the others
+# plot every reading.
+WEIGHT_RANGES = {"28d": 28, "1y": 365, "all": None}
+WEIGHT_DEFAULT = "28d"
+WEIGHT_MAX_POINTS = 400
+WEIGHT_CHART_ID = "health-weight-chart"
+WEIGHT_RANGE_ID = "health-weight-range"
+
+QUERY = {
+    "body_composition": ("body_composition", 28),
+    "calories": ("calories", 7),
+}
+
+TITLE = "Health"
+SOURCES = ("apple-health",)
 
 
 def _stat_card(label, value, sub=None, color=None):
@@ -38,46 +53,99 @@ def _stat_card(label, value, sub=None, color=None):
     ], style={"textAlign": "center", "padding": "0.5rem 1rem"})
 
 
-def _weight_chart(df_comp):
-    """28-day weight trend line chart with 70 kg target dashed line."""
-    mask = df_comp["weight_kg"].notna()
+def _weight_chart(dates, weights, x_range=None):
+    """Weight trend line chart with 70 kg target dashed line.
+
+    Series longer than WEIGHT_MAX_POINTS are reduced with LTTB, so the chart
+    stays light at any range. x_range pins the visible window (a zoomed redraw).
+    """
     fig = go.Figure()
 
-    if mask.any():
+    if len(dates):
+        keep = downsample.lttb(dates.to_numpy().view("int64"), weights.to_numpy(),
+                               WEIGHT_MAX_POINTS)
         fig.add_trace(go.Scatter(
-            x=df_comp.loc[mask, "date"],
-            y=df_comp.loc[mask, "weight_kg"],
-            mode="lines+markers",
+            x=dates.iloc[keep],
+            y=weights.iloc[keep],
+            mode="lines+markers" if len(keep) <= 60 else "lines",
             line={"color": COLOR_BLUE, "width": 2},
             marker={"size": 5, "color": COLOR_BLUE},
             name="Weight",
-            hovertemplate="%{x|%d %b}: %{y:.1f} kg<extra></extra>",
+            hovertemplate="%{x|%d %b %Y}: %{y:.1f} kg<extra></extra>",
         ))
+    span = (x_range[1] - x_range[0]) if x_range else \
+        (dates.iloc[-1] - dates.iloc[0] if len(dates) else timedelta(0))
 
     # Target line
     fig.add_hline(
         y=TARGET_WEIGHT_KG,
         line_dash="dash",
-        line_color="#484f58",
         annotation_text=f"Target {TARGET_WEIGHT_KG} kg",
-        annotation_font_color="#484f58",
-        annotation_font_size=10,
     )
 
     fig.update_layout(
-        paper_bgcolor=CHART_PAPER_BG,
-        plot_bgcolor=CHART_PLOT_BG,
+        template=TEMPLATE,
         margin={"t": 8, "b": 30, "l": 45, "r": 10},
-        font={"color": CHART_FONT_COLOR, "size": 11},
-        showlegend=False,
         height=160,
-        xaxis={"gridcolor": CHART_GRID_COLOR, "showgrid": False,
-               "tickformat": "%d %b", "nticks": 6},
-        yaxis={"gridcolor": CHART_GRID_COLOR, "ticksuffix": " kg"},
+        xaxis={"tickformat": "%b %Y" if span > timedelta(days=180) else "%d %b",
+               "nticks": 6, "range": x_range},
+        yaxis={"ticksuffix": " kg"},
     )
     return fig
 
 
+def _daily_weight_chart(df_comp):
+    """The default view: last weight of each day from get_body_composition()."""
+    weighed = df_comp[df_comp["weight_kg"].notna()]
+    return _weight_chart(weighed["date"], weighed["weight_kg"])
+
+
+def _weight_figure(data_dir, start, end=None, x_range=None):
+    df = apple_health.get_weight_readings(data_dir, start, end)
+    return _weight_chart(df["date"], df["weight_kg"], x_range)
+
+
+def _zoom_window(relayout):
+    """(start, end) Timestamps of a zoom/pan in relayoutData, or None."""
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        bounds = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif isinstance(relayout.get("xaxis.range"), list):
+        bounds = relayout["xaxis.range"]
+    else:
+        return None
+    return pd.Timestamp(bounds[0]), pd.Timestamp(bounds[1])
+
+
+def register_callbacks(app, data_dir):
+    """Weight range buttons and zoom: re-query just the visible window.
+
+    Choosing a range redraws it downsampled; zooming or panning fetches the
+    readings inside the new window, so detail grows as the window narrows.
+    Double-click (autorange) goes back to the chosen range.
+    """
+    @app.callback(
+        Output(WEIGHT_CHART_ID, "figure"),
+        Input(WEIGHT_RANGE_ID, "value"),
+        Input(WEIGHT_CHART_ID, "relayoutData"),
+        prevent_initial_call=True,
+    )
+    def update_weight_chart(range_key, relayout):
+        if ctx.triggered_id == WEIGHT_CHART_ID:
+            relayout = relayout or {}
+            window = _zoom_window(relayout)
+            if window is not None:
+                return _weight_figure(data_dir, window[0], window[1], x_range=list(window))
+            if not relayout.get("xaxis.autorange"):
+                return no_update   # autosize, y-only changes, ...
+        if range_key not in WEIGHT_RANGES or range_key == WEIGHT_DEFAULT:
+            # Same data as the first render, so the view doesn't change on re-select
+            _, days = QUERY["body_composition"]
+            return _daily_weight_chart(apple_health.get_body_composition(data_dir, days))
+        days = WEIGHT_RANGES[range_key]
+        start = datetime.now() - timedelta(days=days) if days is not None else None
+        return _weight_figure(data_dir, start)
+
+
 def _calories_chart(df_cal):
     """7-day calories bar chart."""
     mask = df_cal["calories"].notna()
@@ -89,43 +157,33 @@ def _calories_chart(df_cal):
             x=df_cal["date"],
             y=df_cal["calories"],
             marker_color=COLOR_GREEN,
-            marker_opacity=0.8,
             hovertemplate="%{x|%d %b}: %{y:.0f} kcal<extra></extra>",
         ))
-        fig.add_hline(
-            y=avg,
-            line_dash="dot",
-            line_color="#484f58",
-            annotation_text=f"Avg {avg:.0f}",
-            annotation_font_color="#484f58",
-            annotation_font_size=10,
-        )
+        fig.add_hline(y=avg, line_dash="dot", annotation_text=f"Avg {avg:.0f}")
 
     fig.update_layout(
-        paper_bgcolor=CHART_PAPER_BG,
-        plot_bgcolor=CHART_PLOT_BG,
+        template=TEMPLATE,
         margin={"t": 8, "b": 30, "l": 55, "r": 10},
-        font={"color": CHART_FONT_COLOR, "size": 11},
-        showlegend=False,
         height=130,
-        xaxis={"gridcolor": CHART_GRID_COLOR, "showgrid": False,
-               "tickformat": "%a %-d"},
-        yaxis={"gridcolor": CHART_GRID_COLOR, "ticksuffix": " kcal"},
+        xaxis={"tickformat": "%a %-d"},
+        yaxis={"ticksuffix": " kcal"},
         bargap=0.3,
     )
     return fig
 
 
-def layout(data_dir):
-    df_comp = apple_health.get_body_composition(data_dir, days=28)
-    df_cal = apple_health.get_calories(data_dir, days=7)
+def layout(data_dir, data=None):
+    """Health card. `data` is an apple_health.query() result covering QUERY."""
+    data = data or apple_health.query(data_dir, QUERY)
+    df_comp = data["body_composition"]
+    df_cal = data["calories"]
 
     # --- Current values (most recent non-NaN reading) ---
     has_data = df_comp["weight_kg"].notna().any()
 
     if not has_data:
         return dbc.Card([
-            dbc.CardHeader(html.H5("Health")),
+            dbc.CardHeader(html.H5(TITLE)),
             dbc.CardBody(html.P(
                 "Waiting for Apple Health data -- configure Health Auto Export on iPhone.",
                 className="placeholder-msg",
@@ -133,7 +191,8 @@ def layout(data_dir):
         ])
 
     # Latest readings
-    last_weight = df_comp.loc[df_comp["weight_kg"].notna(), "weight_kg"].iloc[-1]
+    weighed = df_comp[df_comp["weight_kg"].notna()]
+    last_weight = weighed["weight_kg"].iloc[-1]
     last_bf = df_comp.loc[df_comp["body_fat_pct"].notna(), "body_fat_pct"].iloc[-1] \
         if df_comp["body_fat_pct"].notna().any() else None
     last_lm = df_comp.loc[df_comp["lean_mass_kg"].notna(), "lean_mass_kg"].iloc[-1] \
@@ -159,14 +218,29 @@ def layout(data_dir):
     ], className="mb-2")
 
     return dbc.Card([
-        dbc.CardHeader(html.H5("Health")),
+        dbc.CardHeader(html.H5(TITLE)),
         dbc.CardBody([
             stats_row,
-            html.Div("Weight (28 days)", style={"fontSize": "0.7rem", "color": "#8b949e",
-                                                 "textTransform": "uppercase",
-                                                 "letterSpacing": "1px",
-                                                 "marginBottom": "2px"}),
-            dcc.Graph(figure=_weight_chart(df_comp), config={"displayModeBar": False}),
+            html.Div([
+                html.Span("Weight", style={"fontSize": "0.7rem", "color": "#8b949e",
+                                           "textTransform": "uppercase",
+                                           "letterSpacing": "1px"}),
+                dbc.RadioItems(
+                    id=WEIGHT_RANGE_ID,
+                    options=[{"label": "28 days", "value": "28d"},
+                             {"label": "1 year", "value": "1y"},
+                             {"label": "All", "value": "all"}],
+                    value=WEIGHT_DEFAULT,
+                    inline=True,
+                    style={"fontSize": "0.7rem", "color": "#8b949e"},
+                ),
+            ], className="d-flex justify-content-between align-items-center",
+                style={"marginBottom": "2px"}),
+            dcc.Graph(
+                id=WEIGHT_CHART_ID,
+                figure=_daily_weight_chart(df_comp),
+                config={"displayModeBar": False},
+            ),
             html.Div("Calories this week", style={"fontSize": "0.7rem", "color": "#8b949e",
                                                    "textTransform": "uppercase",
                                                    "letterSpacing": "1px",
@@ -5,10 +5,13 @@ Placeholder. Replace with real content when building the Investments module.
 import dash_bootstrap_components as dbc
 from dash import html
 
+TITLE = "Investments"
+SOURCES = ("investments",)
+
 
 def layout(data_dir):
     return dbc.Card([
-        dbc.CardHeader(html.H5("Investments")),
+        dbc.CardHeader(html.H5(TITLE)),
         dbc.CardBody(
             html.P(
                 "Portfolio -- Google Sheets module not yet connected.",
@@ -12,14 +12,15 @@ import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dash import html, dcc
 
+from layouts.theme import COLOR_PURPLE, TEMPLATE
 from modules import apple_health
 
 STUDY_TARGET_HRS = 14.0
-CHART_PAPER_BG = "rgba(0,0,0,0)"
-CHART_PLOT_BG = "rgba(0,0,0,0)"
-CHART_FONT_COLOR = "#8b949e"
-CHART_GRID_COLOR = "#21262d"
-COLOR_PURPLE = "#bc8cff"
+
+QUERY = {"study_hours": ("study_hours", 7)}
+
+TITLE = "Learning"
+SOURCES = ("apple-health", "dreaming-spanish")
 
 
 def _study_chart(df):
@@ -28,26 +29,21 @@ def _study_chart(df):
         x=df["date"],
         y=df["study_hours"],
         marker_color=COLOR_PURPLE,
-        marker_opacity=0.8,
         hovertemplate="%{x|%a %-d}: %{y:.1f} hrs<extra></extra>",
     ))
     fig.update_layout(
-        paper_bgcolor=CHART_PAPER_BG,
-        plot_bgcolor=CHART_PLOT_BG,
+        template=TEMPLATE,
         margin={"t": 6, "b": 28, "l": 38, "r": 8},
-        font={"color": CHART_FONT_COLOR, "size": 11},
-        showlegend=False,
         height=120,
-        xaxis={"gridcolor": CHART_GRID_COLOR, "showgrid": False, "tickformat": "%a"},
-        yaxis={"gridcolor": CHART_GRID_COLOR, "ticksuffix": " h"},
+        xaxis={"tickformat": "%a"},
+        yaxis={"ticksuffix": " h"},
         bargap=0.3,
     )
     return fig
 
 
-def _study_panel(data_dir):
+def _study_panel(df):
     """Left panel: study hours from Apple Health mindfulness data."""
-    df = apple_health.get_study_hours(data_dir, days=7)
 
     total_hrs = df["study_hours"].sum()
     pct = min(int(total_hrs / STUDY_TARGET_HRS * 100), 100)
@@ -78,12 +74,14 @@ def _study_panel(data_dir):
     ])
 
 
-def layout(data_dir):
+def layout(data_dir, data=None):
+    """Learning card. `data` is an apple_health.query() result covering QUERY."""
+    data = data or apple_health.query(data_dir, QUERY)
     return dbc.Card([
-        dbc.CardHeader(html.H5("Learning")),
+        dbc.CardHeader(html.H5(TITLE)),
         dbc.CardBody(
             dbc.Row([
-                dbc.Col(_study_panel(data_dir), md=6),
+                dbc.Col(_study_panel(data["study_hours"]), md=6),
                 dbc.Col(
                     html.P(
                         "Dreaming Spanish -- DS module not yet connected.",
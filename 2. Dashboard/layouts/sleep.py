@@ -4,22 +4,24 @@ Shows:
   - Average sleep hours this week (stat)
   - Bar chart: hours per night for last 7 days with 8-hr target line
 
-Calls modules/apple_health.py at render time.
+Calls modules/apple_health.py at render time, or takes the frame from a batched
+apple_health.query() passed in by serve_layout.
 """
 
 import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dash import html, dcc
 
+from layouts.theme import COLOR_BLUE, TEMPLATE
 from modules import apple_health
 
-CHART_PAPER_BG = "rgba(0,0,0,0)"
-CHART_PLOT_BG = "rgba(0,0,0,0)"
-CHART_FONT_COLOR = "#8b949e"
-CHART_GRID_COLOR = "#21262d"
-COLOR_BLUE = "#58a6ff"
 TARGET_SLEEP_HRS = 8.0
 
+QUERY = {"sleep": ("sleep", 7)}
+
+TITLE = "Sleep"
+SOURCES = ("apple-health",)
+
 
 def _sleep_chart(df):
     """Bar chart of nightly sleep hours."""
@@ -28,40 +30,33 @@ def _sleep_chart(df):
         x=df["date"],
         y=df["sleep_hours"],
         marker_color=COLOR_BLUE,
-        marker_opacity=0.8,
         hovertemplate="%{x|%a %-d}: %{y:.1f} hrs<extra></extra>",
     ))
     fig.add_hline(
         y=TARGET_SLEEP_HRS,
         line_dash="dot",
-        line_color="#484f58",
         annotation_text=f"{TARGET_SLEEP_HRS} hr target",
-        annotation_font_color="#484f58",
-        annotation_font_size=10,
     )
     fig.update_layout(
-        paper_bgcolor=CHART_PAPER_BG,
-        plot_bgcolor=CHART_PLOT_BG,
+        template=TEMPLATE,
         margin={"t": 8, "b": 30, "l": 38, "r": 8},
-        font={"color": CHART_FONT_COLOR, "size": 11},
-        showlegend=False,
         height=160,
-        xaxis={"gridcolor": CHART_GRID_COLOR, "showgrid": False,
-               "tickformat": "%a"},
-        yaxis={"gridcolor": CHART_GRID_COLOR, "range": [0, 10],
-               "ticksuffix": " h"},
+        xaxis={"tickformat": "%a"},
+        yaxis={"range": [0, 10], "ticksuffix": " h"},
         bargap=0.25,
     )
     return fig
 
 
-def layout(data_dir):
-    df = apple_health.get_sleep(data_dir, days=7)
+def layout(data_dir, data=None):
+    """Sleep card. `data` is an apple_health.query() result covering QUERY."""
+    data = data or apple_health.query(data_dir, QUERY)
+    df = data["sleep"]
 
     has_data = df["sleep_hours"].gt(0).any()
     if not has_data:
         return dbc.Card([
-            dbc.CardHeader(html.H5("Sleep")),
+            dbc.CardHeader(html.H5(TITLE)),
             dbc.CardBody(html.P(
                 "Waiting for Apple Health data.",
                 className="placeholder-msg",
@@ -73,7 +68,7 @@ def layout(data_dir):
     avg_color = "#3fb950" if avg >= 7.0 else "#d29922"
 
     return dbc.Card([
-        dbc.CardHeader(html.H5("Sleep")),
+        dbc.CardHeader(html.H5(TITLE)),
         dbc.CardBody([
             html.Div([
                 html.Span(f"{avg:.1f}", style={"fontSize": "2rem", "fontWeight": "700",
@@ -0,0 +1,40 @@
+"""Shared Plotly theme for every dashboard chart.
+
+Figures set template=TEMPLATE and only add what is specific to them (height,
+margins, tick formats, bar gaps). plotly.js can't look templates up by name, so
+each figure still carries the template it uses; keeping this one to the handful
+of settings the dashboard needs, instead of building on Plotly's ~6.5 kB default
+"plotly" template, is what keeps figure JSON small. benchmarks/figure_budget.py
+reports the bytes per figure.
+"""
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+TEMPLATE = "dashboard"
+
+# --- Colours ---
+FONT_COLOR = "#8b949e"
+GRID_COLOR = "#21262d"
+MUTED_COLOR = "#484f58"   # target/average reference lines and their labels
+COLOR_BLUE = "#58a6ff"
+COLOR_GREEN = "#3fb950"
+COLOR_ORANGE = "#d29922"
+COLOR_PURPLE = "#bc8cff"
+
+_axis = {"gridcolor": GRID_COLOR, "zerolinecolor": GRID_COLOR}
+
+pio.templates[TEMPLATE] = go.layout.Template(
+    layout={
+        "paper_bgcolor": "rgba(0,0,0,0)",
+        "plot_bgcolor": "rgba(0,0,0,0)",
+        "font": {"color": FONT_COLOR, "size": 11},
+        "colorway": [COLOR_BLUE, COLOR_GREEN, COLOR_ORANGE, COLOR_PURPLE],
+        "showlegend": False,
+        "xaxis": {**_axis, "showgrid": False},
+        "yaxis": _axis,
+        "annotationdefaults": {"font": {"color": MUTED_COLOR, "size": 10}},
+        "shapedefaults": {"line": {"color": MUTED_COLOR}},
+    },
+    data={"bar": [go.Bar(marker={"opacity": 0.8})]},
+)
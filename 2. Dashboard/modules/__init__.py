@@ -0,0 +1,6 @@
+"""Data-source modules: loading, caching and storage behind the dashboard cards.
+
+Import heavy source-specific clients (googleapiclient, ijson, ...) inside the
+functions that use them rather than at module top, so every boot doesn't pay
+for clients the current request or job never touches.
+"""
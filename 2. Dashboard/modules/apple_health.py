@@ -30,12 +30,19 @@ Metric names used by Health Auto Export:
     mindful_session            - mindfulness session duration in minutes (Forest app)
 """
 
+import gzip
+import hashlib
 import json
 import os
+import pickle
 from datetime import datetime, timedelta
 
+import numpy as np
 import pandas as pd
 
+from modules import health_store
+from modules.metrics import LOADER_SECONDS, timed
+
 
 # Map friendly names to Health Auto Export metric names
 # Note: mindful_minutes is the name used by current versions of Health Auto Export
@@ -50,85 +57,1072 @@ _METRIC = {
 }
 
 
-def _parse_date(date_str):
-    """Parse Health Auto Export date string to datetime, stripping tz offset."""
-    s = str(date_str).strip()
-    # Drop trailing timezone offset like "+1100" or "-0500"
-    parts = s.rsplit(" ", 1)
-    if len(parts) == 2 and len(parts[1]) == 5 and parts[1][0] in ("+", "-"):
-        s = parts[0]
-    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+class MetricSeries:
+    """One metric's readings as parallel arrays, sorted by time.
+
+    ts is datetime64[s] local wall-clock time (offset stripped, as _parse_dates)
+    and utc the same instants in UTC. fields maps each numeric field (qty,
+    totalSleep, asleep, ...) to a float64 array with NaN where a reading does not
+    have that field.
+    """
+
+    __slots__ = ("ts", "utc", "fields")
+
+    def __init__(self, ts, fields, utc=None):
+        self.ts = ts
+        self.utc = utc if utc is not None else ts
+        self.fields = fields
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build from health_store columns (bookkeeping "_" columns dropped)."""
+        return cls(columns["_ts"], {k: v for k, v in columns.items() if not k.startswith("_")},
+                   columns["_utc"])
+
+    @classmethod
+    def empty(cls):
+        return cls(np.array([], dtype="datetime64[s]"), {})
+
+    def __len__(self):
+        return len(self.ts)
+
+    def get(self, field):
+        """Values of `field`, NaN where absent."""
+        values = self.fields.get(field)
+        return values if values is not None else np.full(len(self.ts), np.nan)
+
+    def concat(self, other):
+        """Readings of both series, self first. Not re-sorted."""
+        names = set(self.fields) | set(other.fields)
+        return MetricSeries(
+            np.concatenate([self.ts, other.ts]),
+            {n: np.concatenate([self.get(n), other.get(n)]) for n in names},
+            np.concatenate([self.utc, other.utc]),
+        )
+
+    def to_entries(self):
+        """Readings as entry dicts: numeric fields plus "_date" (datetime)."""
+        fields = list(self.fields.items())
+        entries = []
+        for i, dt in enumerate(self.ts.astype(datetime)):
+            entry = {k: float(v[i]) for k, v in fields if not np.isnan(v[i])}
+            entry["_date"] = dt
+            entries.append(entry)
+        return entries
+
+
+def _parse_dates(values):
+    """Bulk-parse Health Auto Export date strings (a metric's whole "data" array).
+
+    Dates are local wall-clock time with any trailing " +hhmm" offset dropped;
+    the offset gives the UTC instant alongside (a date without one is taken as
+    UTC, so its instant is its wall-clock time). The usual fixed-width "%Y-%m-%d %H:%M:%S +hhmm" layout is packed into one
+    numpy array and goes through a single vectorised to_datetime call (its own
+    %z path is an order of magnitude slower); rows of that exact width without
+    an offset, and date-only "%Y-%m-%d" ones, are parsed in bulk too. Anything
+    else -- single-digit fields, "%Y-%m-%d +hhmm" -- takes the general path:
+    offset token stripped, then "%Y-%m-%d %H:%M:%S" or "%Y-%m-%d". What matches
+    neither becomes NaT.
+
+    Returns:
+        tuple: (local, utc) datetime64[s] arrays, one element per value.
+    """
+    strings = [str(v).strip() for v in values]
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    packed = np.array(strings, dtype="U25").reshape(-1)
+    # Code points per character: "YYYY-mm-dd HH:MM:SS +hhmm" -> offset at [19:25]
+    chars = packed.view(np.uint32).reshape(len(strings), 25)
+    digits = chars[:, 21:25].astype(np.int64) - ord("0")
+    has_tz = (
+        (lengths == 25)
+        & (chars[:, 19] == ord(" "))
+        & np.isin(chars[:, 20], (ord("+"), ord("-")))
+        & ((digits >= 0) & (digits <= 9)).all(axis=1)
+    )
+
+    sign = np.where(chars[:, 20] == ord("-"), -1, 1)
+    offset = np.where(has_tz, sign * (digits[:, :2] @ [36000, 3600] + digits[:, 2:] @ [600, 60]), 0)
+
+    local = pd.Series(pd.to_datetime(packed.astype("U19"), format="%Y-%m-%d %H:%M:%S",
+                                     errors="coerce"))
+    local[~(has_tz | (lengths == 19))] = pd.NaT
+    date_only = ~has_tz & (lengths == 10)
+    if date_only.any():
+        local[date_only] = pd.to_datetime(packed[date_only], format="%Y-%m-%d",
+                                          errors="coerce")
+
+    rest = np.flatnonzero(local.isna().to_numpy() & (lengths > 0))
+    if len(rest):
+        local[rest], offset[rest] = _parse_loose([strings[i] for i in rest])
+    local = local.to_numpy().astype("datetime64[s]")
+    return local, local - offset.astype("timedelta64[s]")
+
+
+def _parse_loose(strings):
+    """_parse_dates() for layouts off the fast path (see there): (local, offset seconds)."""
+    stripped, offsets = [], []
+    for s in strings:
+        # Drop a trailing timezone offset like "+1100" or "-0500"
+        head, _, tail = s.rpartition(" ")
+        if head and len(tail) == 5 and tail[0] in "+-" and tail[1:].isdigit():
+            stripped.append(head)
+            offsets.append((-1 if tail[0] == "-" else 1) * (int(tail[1:3]) * 3600 + int(tail[3:]) * 60))
+        else:
+            stripped.append(s)
+            offsets.append(0)
+    stripped = np.array(stripped, dtype=object)
+    parsed = pd.Series(pd.to_datetime(stripped, format="%Y-%m-%d %H:%M:%S", errors="coerce"))
+    missing = parsed.isna().to_numpy()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(stripped[missing], format="%Y-%m-%d", errors="coerce")
+    return parsed.to_numpy(), np.array(offsets, dtype=np.int64)
+
+
+def _file_identity(filepath):
+    """Cheap identity for an export file: (mtime_ns, size). Changes on rewrite."""
+    st = os.stat(filepath)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _parse_export(filepath):
+    """Parse a single export file.
+
+    Returns:
+        dict: {metric_name: columns} with health_store columns (_ts, _src, _sources
+              and one float64 array per numeric field) in file order. Duplicate
+              timestamps are kept; merging keeps the first one.
+    """
+    with open_export(filepath) as fh:
+        raw = json.load(fh)
+
+    # Handle both {"data": {"metrics": [...]}} and {"metrics": [...]}
+    block = raw.get("data", raw)
+    metric_list = block.get("metrics", [])
+
+    filename = os.path.basename(filepath)
+    data_by_metric: dict = {}
+    for metric in metric_list:
+        name = metric.get("name")
+        if not name:
+            continue
+        data_by_metric.setdefault(name, []).extend(
+            e for e in metric.get("data", []) if isinstance(e, dict)
+        )
+    return {
+        name: _columns_from_records(filename, data)
+        for name, data in data_by_metric.items()
+    }
+
+
+# --- Parse cache ---
+# Parsed exports are cached per file, keyed by (filename, mtime_ns, size), both in
+# memory and as pickle sidecars in apple-health/.cache/ so a restart does not have
+# to re-parse history. Only new or changed files are ever parsed again.
+
+_CACHE_DIRNAME = ".cache"
+_SIDECAR_VERSION = 3   # bump when _parse_export's output format changes
+
+_parsed_files: dict = {}   # filepath -> (identity, parsed)
+_merged: dict = {}         # (ah_dir, since, metrics) -> (signature, merged result)
+
+
+def cache_dir(ah_dir):
+    """Path of the sidecar directory inside apple-health/."""
+    return os.path.join(ah_dir, _CACHE_DIRNAME)
+
+
+def _sidecar_path(ah_dir, filename):
+    return os.path.join(cache_dir(ah_dir), filename + ".pkl")
+
+
+def _read_sidecar(path, identity):
+    """Return parsed columns from a sidecar if it matches `identity`, else None."""
+    try:
+        with open(path, "rb") as fh:
+            cached_identity, parsed = pickle.load(fh)
+    except Exception:
+        return None
+    return parsed if cached_identity == (_SIDECAR_VERSION, identity) else None
+
+
+def _write_sidecar(path, identity, parsed):
+    """Write a sidecar atomically. Failures are ignored -- the cache is optional."""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump(((_SIDECAR_VERSION, identity), parsed), fh,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _load_parsed(ah_dir, filename, identity):
+    """Parsed columns for one export file: memory -> sidecar -> JSON parse."""
+    filepath = os.path.join(ah_dir, filename)
+    cached = _parsed_files.get(filepath)
+    if cached is not None and cached[0] == identity:
+        return cached[1]
+
+    sidecar = _sidecar_path(ah_dir, filename)
+    parsed = _read_sidecar(sidecar, identity)
+    if parsed is None:
+        try:
+            parsed = _parse_export(filepath)
+        except Exception:
+            # Unreadable or half-written file: remember the failure for this
+            # identity only, so a rewrite is picked up on the next call.
+            parsed = {}
+        else:
+            _write_sidecar(sidecar, identity, parsed)
+
+    _parsed_files[filepath] = (identity, parsed)
+    return parsed
+
+
+def _forget_parsed(ah_dir, filenames):
+    """Drop memory entries for exports of ah_dir not in `filenames` (the raw ones still read)."""
+    live_paths = {os.path.join(ah_dir, f) for f in filenames}
+    for filepath in [p for p in _parsed_files if os.path.dirname(p) == ah_dir]:
+        if filepath not in live_paths:
+            del _parsed_files[filepath]
+
+
+def _prune_sidecars(ah_dir, filenames):
+    """Remove sidecars (and memory entries) of exports not in `filenames`."""
+    sidecars = cache_dir(ah_dir)
+    if os.path.isdir(sidecars):
+        live = {f + ".pkl" for f in filenames}
+        for name in os.listdir(sidecars):
+            if name.endswith(".pkl") and name not in live:
+                try:
+                    os.remove(os.path.join(sidecars, name))
+                except OSError:
+                    pass
+    _forget_parsed(ah_dir, filenames)
+
+
+def clear_caches():
+    """Forget every in-memory cache (parsed files, merged results).
+
+    Sidecars and the store on disk are left alone; the next call behaves like
+    the first one after a restart.
+    """
+    _parsed_files.clear()
+    _merged.clear()
+
+
+# Exports are plain JSON or compressed (modules/ingest.py writes gzip by default)
+EXPORT_EXTENSIONS = (".json", ".json.gz", ".json.zst")
+# Typical JSON-to-compressed ratio, to compare compressed files with the stream threshold
+_COMPRESSION_RATIO = 8
+
+
+def _is_export(filename):
+    # The webhook names every payload export_<id>.json[.gz|.zst]; other .json files
+    # in apple-health/ are ours.
+    return filename.startswith("export_") and filename.endswith(EXPORT_EXTENSIONS)
+
+
+def open_export(path):
+    """Binary file object over an export's JSON, decompressing .gz / .zst exports."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        import zstandard
+
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def _json_size(filename, identity):
+    """Approximate size of an export's JSON from its size on disk."""
+    if filename.endswith(".json"):
+        return identity[1]
+    return identity[1] * _COMPRESSION_RATIO
+
+
+def _raw_identities(ah_dir):
+    """[(filename, identity), ...] for every raw export, newest first."""
+    identities = []
+    for filename in sorted(
+        [f for f in os.listdir(ah_dir) if _is_export(f)],
+        reverse=True,
+    ):
         try:
-            return datetime.strptime(s, fmt)
-        except ValueError:
+            identities.append((filename, _file_identity(os.path.join(ah_dir, filename))))
+        except OSError:
             continue
+    return identities
+
+
+# --- Streaming ---
+# Full-history backfills from Health Auto Export can be hundreds of MB. Those are
+# never json.load()ed: iter_export_parts() walks them with ijson one entry (or
+# workout, ...) at a time and compaction folds the entries into the store in
+# fixed-size batches, so peak memory does not depend on the file size.
+# ijson is imported on first use: most boots never see a payload this large.
+
+# Pending exports larger than this are streamed into the store before a read
+STREAM_THRESHOLD_BYTES = int(os.getenv("APPLE_HEALTH_STREAM_THRESHOLD_MB", "25")) * 1024 * 1024
+_STREAM_BATCH = 50_000
+_MERGE_ROWS = 1_000_000
+
+_METRIC_PREFIXES = ("data.metrics.item", "metrics.item")
+_NAME_PREFIXES = tuple(p + ".name" for p in _METRIC_PREFIXES)
+_ENTRY_PREFIXES = tuple(p + ".data.item" for p in _METRIC_PREFIXES)
+
+
+def _part_at(prefix):
+    """What a value at ijson `prefix` becomes in iter_export_parts(): (kind, key) or None."""
+    if prefix in _ENTRY_PREFIXES:
+        return "entry", None
+    parent, _, key = prefix.rpartition(".")
+    if parent in _METRIC_PREFIXES:
+        return ("header", key) if key != "data" else None
+    if key == "item":
+        block, _, key = parent.rpartition(".")
+        if (block == "data" and key != "metrics") or (not block and key not in ("data", "metrics")):
+            return "section", key
+    elif parent == "data" or (not parent and key not in ("", "data")):
+        return ("value", key) if key != "metrics" else None
     return None
 
 
-def load_all_exports(data_dir):
-    """Load and merge all export JSON files from apple-health/.
+def iter_export_parts(fh):
+    """Yield every part of an export, streaming, in file order.
+
+    `fh` is a binary file object. Parts are:
+        ("entry", metric_name, entry_dict)  a data point
+        ("metric", metric_name, header)     end of a metric object; header is the
+                                            object minus "data" ("name", "units", ...)
+        ("section", key, item)              an item of another list in the data
+                                            block, e.g. "workouts"
+        ("value", key, value)               any other key of the data block
+    Top-level keys beside "data" count as data block keys. Only one entry or item
+    is built at a time; entries of a metric whose "name" comes after its "data"
+    array are held until the name is seen.
+    """
+    import ijson
+    from ijson.common import ObjectBuilder
+
+    name, header, pending = None, {}, []
+    builder, depth, target = None, 0, None
+    for prefix, event, value in ijson.parse(fh, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            depth += (event in ("start_map", "start_array")) - (event in ("end_map", "end_array"))
+            if depth:
+                continue
+            value, builder = builder.value, None
+        elif prefix in _METRIC_PREFIXES and event in ("start_map", "end_map"):
+            if event == "end_map" and name:
+                yield "metric", name, header
+            name, header, pending = None, {}, []
+            continue
+        else:
+            target = _part_at(prefix)
+            # A list in the data block is a section: its items are the parts
+            if (target is None or event in ("map_key", "end_map", "end_array")
+                    or (target[0] == "value" and event == "start_array")):
+                continue
+            if event in ("start_map", "start_array"):
+                builder, depth = ObjectBuilder(), 1
+                builder.event(event, value)
+                continue
+
+        kind, key = target
+        if kind == "entry":
+            if not isinstance(value, dict):
+                continue
+            if name:
+                yield "entry", name, value
+            else:
+                pending.append(value)
+        elif kind == "header":
+            header[key] = value
+            if key == "name" and isinstance(value, str) and value:
+                name = value
+                for entry in pending:
+                    yield "entry", name, entry
+                pending = []
+        else:
+            yield kind, key, value
+
+
+def _columns_from_records(src, entries):
+    """Column arrays for health_store from a batch of raw entries of one metric.
+
+    Rows with an unparseable date are dropped; duplicates are left for
+    health_store.merge_columns (first entry per timestamp wins). Numeric fields
+    become float64 columns; strings (e.g. "source") are not stored.
+    """
+    local, utc = _parse_dates([e.get("date", "") for e in entries])
+    valid = ~np.isnat(local)
+    ts = local[valid]
+    rows = [e for e, ok in zip(entries, valid) if ok]
+
+    fields = sorted({
+        k for e in rows for k, v in e.items()
+        if not k.startswith("_") and isinstance(v, (int, float)) and not isinstance(v, bool)
+    })
+    columns = {"_ts": ts, "_utc": utc[valid], **health_store.source_columns(src, len(rows))}
+    for field in fields:
+        columns[field] = np.array(
+            [e.get(field) if isinstance(e.get(field), (int, float)) else np.nan
+             for e in rows],
+            dtype="float64",
+        )
+    return columns
+
+
+def _stream_export(path):
+    """iter_export_parts() over an export file on disk."""
+    with open_export(path) as fh:
+        yield from iter_export_parts(fh)
+
+
+def _iter_payload_parts(payload):
+    """iter_export_parts() over an already-parsed payload."""
+    # Handle both {"data": {"metrics": [...]}} and {"metrics": [...]}
+    block = payload.get("data", payload)
+    if not isinstance(block, dict):
+        return
+    for key, value in block.items():
+        if key != "metrics":
+            if isinstance(value, list):
+                for item in value:
+                    yield "section", key, item
+            else:
+                yield "value", key, value
+            continue
+        for metric in value if isinstance(value, list) else []:
+            name = metric.get("name") if isinstance(metric, dict) else None
+            if not name:
+                continue
+            for entry in metric.get("data", []):
+                if isinstance(entry, dict):
+                    yield "entry", name, entry
+            yield "metric", name, {k: v for k, v in metric.items() if k != "data"}
+
+
+def _section_digest(key, item):
+    """Digest of one item outside "metrics" ("workouts", ...), whatever its key order."""
+    body = json.dumps([key, item], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(body.encode(), digest_size=8).hexdigest()
+
+
+def _split_parts(parts, digests):
+    """(metric_name, entry) records of export parts; section item digests go to `digests`."""
+    for kind, key, value in parts:
+        if kind == "entry":
+            yield key, value
+        elif kind == "section":
+            digests.append(_section_digest(key, value))
+
+
+def _known_sections(ah_dir):
+    """Digests of every section item in the folded exports."""
+    return {d for digests in health_store.read_sections(ah_dir).values() for d in digests}
+
+
+def _iter_batches(records):
+    """Group streamed (metric, entry) records into per-metric batches of entries."""
+    batches: dict = {}
+    for name, entry in records:
+        batch = batches.setdefault(name, [])
+        batch.append(entry)
+        if len(batch) >= _STREAM_BATCH:
+            yield name, batch
+            batches[name] = []
+    for name, batch in batches.items():
+        if batch:
+            yield name, batch
+
+
+def _iter_record_columns(records, src):
+    """Group streamed (metric, entry) records into per-metric column batches."""
+    for name, batch in _iter_batches(records):
+        yield name, _columns_from_records(src, batch)
+
+
+def _fold_records(columns, records, src):
+    """Merge streamed records from export `src` into store columns, in place.
+
+    Column batches are buffered per metric and merged _MERGE_ROWS at a time, so
+    the store arrays are not re-sorted for every batch.
+    """
+    buffered: dict = {}
+    for name, chunk in _iter_record_columns(records, src):
+        chunks = buffered.setdefault(name, [])
+        chunks.append(chunk)
+        if sum(len(c["_ts"]) for c in chunks) >= _MERGE_ROWS:
+            columns[name] = health_store.merge_columns(columns.get(name), health_store.concat_columns(chunks))
+            buffered[name] = []
+    for name, chunks in buffered.items():
+        if chunks:
+            columns[name] = health_store.merge_columns(columns.get(name), health_store.concat_columns(chunks))
+
+
+def _pending_exports(ah_dir):
+    """Raw exports not yet folded into the store (or changed since), newest first."""
+    folded = health_store.read_folded(ah_dir)
+    return [
+        (filename, identity) for filename, identity in _raw_identities(ah_dir)
+        if folded.get(filename) != list(identity)
+    ]
+
+
+def _fold_exports(ah_dir, exports, replaced=()):
+    """Fold exports into the store. Caller holds health_store.locked(ah_dir).
+
+    Args:
+        exports: [(filename, identity, parts), ...] where parts() returns an
+                 iterator of that export's parts (see iter_export_parts).
+        replaced: exports whose rows are dropped, and which are forgotten, once
+                  `exports` are folded (see replace_exports).
+
+    Returns:
+        list: filenames folded. An export whose parts fail part-way is rolled
+              back and left unfolded.
+    """
+    if not health_store.is_current(ah_dir):
+        health_store.reset(ah_dir)   # every export is pending again and refolds
+    folded = dict(health_store.read_folded(ah_dir))
+    sections = health_store.read_sections(ah_dir)
+    updated = dict(sections)
+    columns = {
+        name: health_store.read_metric(path)
+        for name, path in health_store.metric_files(ah_dir).items()
+    }
+    done = []
+    for filename, identity, parts in exports:
+        # A changed file replaces everything it contributed before
+        health_store.drop_source(columns, filename)
+        digests = []
+        try:
+            _fold_records(columns, _split_parts(parts(), digests), filename)
+        except Exception:
+            health_store.drop_source(columns, filename)
+            continue
+        folded[filename] = list(identity)
+        updated.pop(filename, None)
+        if digests:
+            updated[filename] = digests
+        done.append(filename)
+
+    if done and replaced:
+        for filename in replaced:
+            health_store.drop_source(columns, filename)
+            folded.pop(filename, None)
+            updated.pop(filename, None)
+    if done:
+        for name, metric_columns in columns.items():
+            health_store.write_metric(ah_dir, name, health_store.prune_sources(metric_columns))
+        health_store.write_folded(ah_dir, folded)
+        if updated != sections:
+            health_store.write_sections(ah_dir, updated)
+    return done
+
+
+def compact_exports(data_dir):
+    """Fold raw exports into the columnar store (modules/health_store.py).
+
+    Only files not yet folded (or changed since) are read, and each is streamed
+    (see iter_export_parts). Newest file wins per (metric, datetime), exactly as
+    in load_metrics. Raw files are left in place; once folded, load_metrics reads
+    them from the store instead. Unreadable files are skipped and retried on the
+    next run.
 
     Returns:
-        dict: {metric_name: [entry_dict, ...]} where each entry_dict contains
-              the original fields plus "_date" (datetime). Sorted ascending by _date.
-              Entries are deduplicated by (metric, datetime) across multiple files.
+        int: number of export files folded.
     """
     ah_dir = os.path.join(data_dir, "apple-health")
     if not os.path.isdir(ah_dir):
-        return {}
+        return 0
 
-    # Load files newest-first so first-seen wins in deduplication
-    files = sorted(
-        [f for f in os.listdir(ah_dir) if f.endswith(".json")],
-        reverse=True,
-    )
+    with health_store.locked(ah_dir):
+        pending = [
+            (filename, identity,
+             lambda path=os.path.join(ah_dir, filename): _stream_export(path))
+            for filename, identity in _pending_exports(ah_dir)
+        ]
+        done = _fold_exports(ah_dir, pending) if pending else []
+        _tidy(ah_dir)
+    return len(done)
 
-    metrics: dict = {}
 
-    for filename in files:
-        filepath = os.path.join(ah_dir, filename)
-        try:
-            with open(filepath) as fh:
-                raw = json.load(fh)
-        except Exception:
+def _tidy(ah_dir):
+    """Drop sidecars of exports that are folded or gone.
+
+    Done here rather than in load_metrics, so reads never delete. Caller holds
+    health_store.locked(ah_dir).
+    """
+    _prune_sidecars(ah_dir, [f for f, _ in _pending_exports(ah_dir)])
+    # Per-export time ranges were once kept in manifest.json; nothing reads it now
+    try:
+        os.remove(os.path.join(ah_dir, "manifest.json"))
+    except OSError:
+        pass
+
+
+def ingest_export(data_dir, filename, payload=None):
+    """Fold a payload the webhook has just saved as apple-health/`filename`.
+
+    Uses the payload already in memory, so the file is never parsed back; the
+    saved file is marked folded. Reads then find nothing pending and do no JSON
+    parsing at all. Without `payload` (too large to hold) the file is streamed
+    instead.
+
+    Returns:
+        bool: True if the payload was folded (otherwise compaction retries it).
+    """
+    ah_dir = os.path.join(data_dir, "apple-health")
+    identity = _file_identity(os.path.join(ah_dir, filename))
+    with health_store.locked(ah_dir):
+        parts = ((lambda: _iter_payload_parts(payload)) if payload is not None
+                 else (lambda: _stream_export(os.path.join(ah_dir, filename))))
+        done = _fold_exports(ah_dir, [(filename, identity, parts)])
+    return bool(done)
+
+
+def _dated_rows(name, entries):
+    """(entries with a parseable date, their health_store columns)."""
+    local, _ = _parse_dates([e.get("date", "") for e in entries])
+    rows = [e for e, ok in zip(entries, ~np.isnat(local)) if ok]
+    return rows, _columns_from_records(name, rows)
+
+
+def _first_of_ts(ts):
+    """Mask of the first row for each instant (the one merge_columns keeps)."""
+    first = np.zeros(len(ts), dtype=bool)
+    first[np.unique(ts, return_index=True)[1]] = True
+    return first
+
+
+def _changed(columns, series):
+    """Mask of rows in `columns` that `series` (stored, or None) doesn't hold unchanged.
+
+    Unchanged means a stored reading at the same instant, with the same wall-clock
+    time and numeric fields, NaN matching NaN.
+    """
+    ts = columns["_ts"]
+    if series is None or not len(series.ts):
+        return np.ones(len(ts), dtype=bool)
+    # series is in wall-clock order; look readings up by instant
+    by_utc = np.argsort(series.utc, kind="stable")
+    pos = by_utc[np.minimum(np.searchsorted(series.utc[by_utc], columns["_utc"]), len(by_utc) - 1)]
+    same = (series.utc[pos] == columns["_utc"]) & (series.ts[pos] == ts)
+    for field in {k for k in columns if not k.startswith("_")} | set(series.fields):
+        mine = columns.get(field, np.full(len(ts), np.nan))
+        theirs = series.get(field)[pos]
+        same &= (mine == theirs) | (np.isnan(mine) & np.isnan(theirs))
+    return ~same
+
+
+def new_entries(data_dir, payload):
+    """Reduce a webhook payload to the readings the store doesn't already hold.
+
+    Health Auto Export resends its whole window on every push, so most of a
+    payload is usually stored already. An entry is dropped when load_metrics has
+    a reading of that metric at the same timestamp with the same numeric fields
+    (NaN matching NaN), or when an earlier entry in the payload has its timestamp
+    (merge_columns keeps the first one anyway). What is left is new or changed,
+    and as the newest export it wins over the stored rows just as the full
+    payload would have.
+
+    Items of the data block's other lists ("workouts", ...) are dropped when a
+    folded export already holds an identical one, or an earlier item of the
+    payload is identical; the rest count as new content like entries do.
+
+    Returns:
+        tuple: (payload, kept, total) -- the reduced payload, with one metric
+               object per name, and its entry and item count against the original's.
+    """
+    block = payload.get("data", payload)
+    if not isinstance(block, dict):
+        return payload, 0, 0
+    known = _known_sections(os.path.join(data_dir, "apple-health"))
+    sections: dict = {}   # key -> new items
+    total = 0
+    for key, items in block.items():
+        if key == "metrics" or not isinstance(items, list):
             continue
+        total += len(items)
+        sections[key] = []
+        for item in items:
+            digest = _section_digest(key, item)
+            if digest not in known:
+                known.add(digest)
+                sections[key].append(item)
+    groups: dict = {}   # name -> (metric object minus "data", [entry, ...])
+    for metric in block.get("metrics", []):
+        name = metric.get("name") if isinstance(metric, dict) else None
+        if not name:
+            continue
+        _, entries = groups.setdefault(name, ({k: v for k, v in metric.items() if k != "data"}, []))
+        entries.extend(e for e in metric.get("data", []) if isinstance(e, dict))
 
-        # Handle both {"data": {"metrics": [...]}} and {"metrics": [...]}
-        block = raw.get("data", raw)
-        metric_list = block.get("metrics", [])
+    parsed = {name: _dated_rows(name, entries) for name, (_, entries) in groups.items()}
+    starts = [columns["_ts"].min() for _, columns in parsed.values() if len(columns["_ts"])]
+    # A day early: the same instant may be stored under another offset's wall-clock time
+    since = pd.Timestamp(min(starts)).to_pydatetime() - timedelta(days=1) if starts else None
+    stored = load_metrics(data_dir, since=since, metrics=groups) if starts else {}
 
-        for metric in metric_list:
-            name = metric.get("name")
-            if not name:
+    out = []
+    kept = sum(len(items) for items in sections.values())
+    for name, (rows, columns) in parsed.items():
+        keep = _first_of_ts(columns["_utc"]) & _changed(columns, stored.get(name))
+        if keep.any():
+            out.append({**groups[name][0], "data": [e for e, k in zip(rows, keep) if k]})
+            kept += int(keep.sum())
+
+    total += sum(len(entries) for _, entries in groups.values())
+    reduced = {k: v for k, v in block.items() if k not in sections}
+    reduced.update({key: items for key, items in sections.items() if items}, metrics=out)
+    return ({**payload, "data": reduced} if block is not payload else reduced), kept, total
+
+
+def iter_new_entries(data_dir, parts):
+    """new_entries() over streamed export parts (iter_export_parts), for large payloads.
+
+    Entries are taken _STREAM_BATCH at a time within each metric object, so
+    memory follows the batch size rather than the payload's (plus 8 bytes per
+    distinct timestamp, to drop repeats across batches, and a digest per item).
+
+    Yields:
+        the parts to save, for ingest.export_chunks(): the new entries as
+        ("entries", metric_name, [entry, ...]) batches, the new section items,
+        and every "metric" and "value" part unchanged.
+    """
+    stored = load_metrics(data_dir)
+    known = _known_sections(os.path.join(data_dir, "apple-health"))
+    seen: dict = {}   # metric -> sorted instants of earlier batches
+
+    def reduce(name, batch):
+        rows, columns = _dated_rows(name, batch)
+        utc = columns["_utc"]
+        earlier = seen.get(name, np.array([], dtype="datetime64[s]"))
+        keep = _first_of_ts(utc) & ~np.isin(utc, earlier) & _changed(columns, stored.get(name))
+        seen[name] = np.union1d(earlier, utc)
+        return "entries", name, [e for e, k in zip(rows, keep) if k]
+
+    batch, batch_name = [], None
+    for kind, key, value in parts:
+        if batch and (kind != "entry" or key != batch_name or len(batch) >= _STREAM_BATCH):
+            yield reduce(batch_name, batch)
+            batch = []
+        if kind == "entry":
+            batch.append(value)
+            batch_name = key
+            continue
+        if kind == "section":
+            digest = _section_digest(key, value)
+            if digest in known:
                 continue
-            if name not in metrics:
-                metrics[name] = {}  # key: full datetime ISO string
+            known.add(digest)
+        yield kind, key, value
+    if batch:
+        yield reduce(batch_name, batch)
 
-            for entry in metric.get("data", []):
-                dt = _parse_date(entry.get("date", ""))
-                if dt is None:
-                    continue
-                key = dt.isoformat()
-                if key not in metrics[name]:  # newest file wins
-                    metrics[name][key] = {**entry, "_date": dt}
-
-    # Convert to sorted lists
+
+def _winners(ah_dir, filenames):
+    """Which entries of `filenames` load_metrics would pick, and what else they hold.
+
+    Folds a locator per entry -- its timestamp, file and position in the file --
+    through the same columnar merge as the store, so memory is ~20 bytes per
+    reading rather than its parsed entry.
+
+    Returns:
+        tuple: ({filename: sorted positions of its winning entries},
+                {section keys}, {value key: value from the newest file holding it})
+    """
+    locators: dict = {}
+    keys, values = set(), {}
+
+    def records(parts):
+        position = 0
+        for kind, key, value in parts:
+            if kind == "entry":
+                yield key, {"date": value.get("date", ""), "pos": position}
+                position += 1
+            elif kind == "section":
+                keys.add(key)
+            elif kind == "value":
+                values[key] = value
+
+    for filename in sorted(filenames):   # oldest first, so newer values overwrite
+        _fold_records(locators, records(_stream_export(os.path.join(ah_dir, filename))), filename)
+    positions: dict = {}
+    for columns in locators.values():
+        for code, filename in enumerate(columns["_sources"].tolist()):
+            positions.setdefault(filename, []).append(columns["pos"][columns["_src"] == code])
+    return ({f: np.sort(np.concatenate(p)) for f, p in positions.items()}, keys, values)
+
+
+def consolidate_exports(ah_dir, filenames):
+    """The contents of several exports as one, for replace_exports().
+
+    Keeps, for each (metric, timestamp), the entry load_metrics would pick among
+    these files -- the first in its file, from the highest filename -- so an
+    export holding just these can stand in for all of them. Each winning entry
+    stays in a copy of its metric object, "units" and all; workouts and other
+    section items are kept once each, and other data block values from the newest
+    file. Files are streamed, a few times over; memory follows the number of
+    readings at ~20 bytes each, not the entries or the files' size.
+
+    Yields:
+        ingest.export_chunks() parts.
+    """
+    winners, keys, values = _winners(ah_dir, filenames)
+    for filename in sorted(filenames):
+        wanted = winners.get(filename)
+        if wanted is None:
+            continue
+        found = position = 0
+        batch = []
+        for kind, key, value in _stream_export(os.path.join(ah_dir, filename)):
+            if kind == "entry":
+                if found < len(wanted) and wanted[found] == position:
+                    batch.append(value)
+                    found += 1
+                position += 1
+                if len(batch) >= _STREAM_BATCH:
+                    yield "entries", key, batch
+                    batch = []
+            elif kind == "metric":
+                # A metric object's entries all come before its "metric" part
+                if batch:
+                    yield "entries", key, batch
+                    batch = []
+                yield kind, key, value
+
+    # One pass per key keeps each list contiguous in the archive
+    for section in sorted(keys):
+        seen = set()
+        for filename in sorted(filenames):
+            for kind, key, value in _stream_export(os.path.join(ah_dir, filename)):
+                if kind == "section" and key == section:
+                    digest = _section_digest(key, value)
+                    if digest not in seen:
+                        seen.add(digest)
+                        yield kind, key, value
+    for key in sorted(values):
+        yield "value", key, values[key]
+
+
+def replace_exports(data_dir, filenames, archive):
+    """Swap exports for `archive`, an export already written that consolidates them.
+
+    Under the store lock the archive is folded in, the rows and bookkeeping of
+    `filenames` are dropped, and then their files are deleted. If the archive
+    can't be folded nothing is removed. Reads see the same data throughout:
+    consolidate_exports() keeps exactly the entries that win among the files.
+
+    Returns:
+        bool: True if the files were replaced.
+    """
+    ah_dir = os.path.join(data_dir, "apple-health")
+    path = os.path.join(ah_dir, archive)
+    with health_store.locked(ah_dir):
+        done = _fold_exports(ah_dir, [
+            (archive, _file_identity(path), lambda: _stream_export(path)),
+        ], replaced=[f for f in filenames if f != archive])
+        if not done:
+            return False
+        for filename in filenames:
+            if filename != archive:
+                os.remove(os.path.join(ah_dir, filename))
+        _tidy(ah_dir)
+    return True
+
+
+_MERGED_KEEP = 8  # windows kept in the merged-result memo
+
+
+def load_metrics(data_dir, since=None, metrics=None):
+    """Load and merge the columnar store plus any export JSON not yet folded into it.
+
+    Raw files are only parsed when new or changed since the last call (see the
+    parse cache above); files over STREAM_THRESHOLD_BYTES are streamed into the
+    store instead of being loaded whole. The merged result is reused while nothing
+    on disk has changed, so callers must treat it as read-only.
+
+    Args:
+        since: optional datetime; only readings at or after it are returned.
+        metrics: optional iterable of metric names to load (default: all).
+
+    Returns:
+        dict: {metric_name: MetricSeries}, deduplicated by (metric, instant)
+              across files with the newest file winning.
+    """
+    ah_dir = os.path.join(data_dir, "apple-health")
+    if not os.path.isdir(ah_dir):
+        return {}
+    since = since.replace(microsecond=0) if since is not None else None
+    metrics = frozenset(metrics) if metrics is not None else None
+
+    if not health_store.is_current(ah_dir):
+        compact_exports(data_dir)   # rebuilds a store written in an older format
+    raw = _pending_exports(ah_dir)
+    if any(_json_size(f, identity) > STREAM_THRESHOLD_BYTES for f, identity in raw):
+        # Too big to load whole -- stream into the store first. Anything still
+        # oversized afterwards failed to parse and is skipped.
+        compact_exports(data_dir)
+        raw = [
+            (filename, identity) for filename, identity in _pending_exports(ah_dir)
+            if _json_size(filename, identity) <= STREAM_THRESHOLD_BYTES
+        ]
+    store_paths = {
+        name: path for name, path in health_store.metric_files(ah_dir).items()
+        if metrics is None or name in metrics
+    }
+    stored = {name: _file_identity(path) for name, path in store_paths.items()}
+    signature = (tuple(raw), tuple(sorted(stored.items())))
+
+    memo_key = (ah_dir, since, metrics)
+    cached = _merged.get(memo_key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    chunks: dict = {}   # metric -> [raw export columns, ...]
+    for filename, identity in raw:
+        parsed = _load_parsed(ah_dir, filename, identity)
+        for name, columns in parsed.items():
+            if metrics is None or name in metrics:
+                chunks.setdefault(name, []).append(columns)
+
+    since64 = np.datetime64(since, "s") if since is not None else None
+    result = {}
+    for name in set(chunks) | set(store_paths):
+        columns = None
+        if name in store_paths:
+            columns = health_store.read_metric(store_paths[name])
+            # Rows from exports that changed since they were folded are re-read raw
+            columns = health_store.without_sources(columns, [f for f, _ in raw])
+            if since64 is not None:
+                columns = health_store.select_rows(columns, columns["_ts"] >= since64)
+        if name in chunks:
+            incoming = health_store.concat_columns(chunks[name])
+            if since64 is not None:
+                incoming = health_store.select_rows(incoming, incoming["_ts"] >= since64)
+            # Newest file wins per instant; result is sorted by time
+            columns = health_store.merge_columns(columns, incoming)
+        result[name] = MetricSeries.from_columns(columns)
+
+    # Reads only add sidecars for files they parsed; compaction prunes them
+    _forget_parsed(ah_dir, [f for f, _ in raw])
+
+    _merged[memo_key] = (signature, result)
+    while len(_merged) > _MERGED_KEEP:
+        del _merged[next(iter(_merged))]
+    return result
+
+
+def load_all_exports(data_dir, since=None, metrics=None):
+    """load_metrics() as lists of entry dicts, for scripts and ad-hoc use.
+
+    Returns:
+        dict: {metric_name: [entry_dict, ...]} where each entry_dict holds the
+              numeric fields plus "_date" (datetime). Sorted ascending by _date.
+    """
     return {
-        name: sorted(entries.values(), key=lambda e: e["_date"])
-        for name, entries in metrics.items()
+        name: series.to_entries()
+        for name, series in load_metrics(data_dir, since, metrics).items()
     }
 
 
-def _date_range_df(days):
+def _date_range_df(days, now=None):
     """Return a DataFrame with a 'date' column covering today-days to today."""
+    now = now or datetime.now()
     dates = pd.date_range(
-        start=(datetime.now() - timedelta(days=days)).date(),
-        end=datetime.now().date(),
+        start=(now - timedelta(days=days)).date(),
+        end=now.date(),
         freq="D",
     )
     return pd.DataFrame({"date": pd.to_datetime(dates)})
 
 
+# --- Daily aggregation ---
+# How several readings on the same calendar day collapse into one value:
+#   last - last reading of the day wins, even if it has no value (weight, calories)
+#   max  - largest value of the day, ignoring missing ones (sleep; skips naps)
+#   sum  - total of the day (mindful minutes)
+
+def _truthy(values):
+    # Python truthiness of a stored field: absent (NaN) and 0 are both falsy
+    return ~np.isnan(values) & (values != 0)
+
+
+def _reduce_last(values):
+    return values[~values.index.duplicated(keep="last")]
+
+
+def _reduce_max(values):
+    return values.groupby(level=0).max()
+
+
+def _reduce_sum(values):
+    # Lay each day's readings out as a row and add column by column, so every day
+    # is summed in input order exactly like a running += (np.add.reduce would
+    # reorder the additions and change the last bits).
+    if values.empty:
+        return values
+    days = values.index
+    new_day = np.append(True, days[1:] != days[:-1])
+    starts = np.flatnonzero(new_day)
+    group = np.cumsum(new_day) - 1
+    grid = np.zeros((len(starts), np.bincount(group).max()))
+    grid[group, np.arange(len(values)) - starts[group]] = values.to_numpy()
+    totals = np.zeros(len(starts))
+    for column in grid.T:
+        totals += column
+    return pd.Series(totals, index=days[starts])
+
+
+_POLICIES = {
+    "last": _reduce_last,
+    "max":  _reduce_max,
+    "sum":  _reduce_sum,
+}
+
+
+def _fill_daily(df, col, series, values, cutoff, policy, fill=float("nan")):
+    """Bucket readings by day, reduce each day with `policy`, and write df[col].
+
+    `values` is one float per reading of `series`. Readings before `cutoff` are
+    ignored; days without readings get `fill`. `df` is a _date_range_df() frame
+    and is modified in place.
+    """
+    ts = pd.DatetimeIndex(series.ts.astype("datetime64[ns]"))
+    values = pd.Series(values, index=ts, dtype="float64")
+    values = values[ts >= cutoff]
+    # Group by day, keeping input order within each day
+    values.index = values.index.normalize()
+    values = values.iloc[np.argsort(values.index.to_numpy(), kind="stable")]
+
+    daily = _POLICIES[policy](values).reindex(df["date"])
+    df[col] = daily.fillna(fill).to_numpy()
+
+
+def _series(exports, name):
+    return exports.get(name) or MetricSeries.empty()
+
+
+def _body_composition(exports, days, now):
+    cutoff = now - timedelta(days=days)
+
+    df = _date_range_df(days, now)
+    # Last reading of the day wins
+    for col, key in (("weight_kg", "weight"), ("body_fat_pct", "body_fat"),
+                     ("lean_mass_kg", "lean_mass")):
+        series = _series(exports, _METRIC[key])
+        _fill_daily(df, col, series, series.get("qty"), cutoff, "last")
+    return df
+
+
+@timed(LOADER_SECONDS, loader="get_body_composition")
 def get_body_composition(data_dir, days=28):
     """Daily body composition over the last `days` days.
 
@@ -136,53 +1130,72 @@ def get_body_composition(data_dir, days=28):
         DataFrame columns: date, weight_kg, body_fat_pct, lean_mass_kg
         Rows with no reading have NaN. Sorted ascending by date.
     """
-    exports = load_all_exports(data_dir)
-    cutoff = datetime.now() - timedelta(days=days)
+    return query(data_dir, {"body_composition": ("body_composition", days)})["body_composition"]
 
-    df = _date_range_df(days)
-    df["weight_kg"] = float("nan")
-    df["body_fat_pct"] = float("nan")
-    df["lean_mass_kg"] = float("nan")
 
-    def _fill(col, metric_key):
-        for entry in exports.get(_METRIC[metric_key], []):
-            if entry["_date"] < cutoff:
-                continue
-            d = pd.Timestamp(entry["_date"].date())
-            mask = df["date"] == d
-            # Last reading of the day wins (entries are sorted ascending)
-            if mask.any():
-                df.loc[mask, col] = entry.get("qty", float("nan"))
-
-    _fill("weight_kg", "weight")
-    _fill("body_fat_pct", "body_fat")
-    _fill("lean_mass_kg", "lean_mass")
+@timed(LOADER_SECONDS, loader="get_weight_readings")
+def get_weight_readings(data_dir, start=None, end=None):
+    """Every weight reading from `start` to `end` (datetimes; None = unbounded).
+
+    Nothing is bucketed by day, unlike get_body_composition(), so long-range and
+    zoomed charts can pick their own resolution (see modules/downsample.py).
+
+    Returns:
+        DataFrame columns: date, weight_kg -- sorted ascending, no NaN weights
+    """
+    name = _METRIC["weight"]
+    # Whole days, so nearby zoom windows share load_metrics()'s memo
+    since = datetime.combine(start.date(), datetime.min.time()) if start is not None else None
+    series = _series(load_metrics(data_dir, since=since, metrics=[name]), name)
+    df = pd.DataFrame({
+        "date": pd.DatetimeIndex(series.ts.astype("datetime64[ns]")),
+        "weight_kg": series.get("qty"),
+    })
+    keep = df["weight_kg"].notna()
+    if start is not None:
+        keep &= df["date"] >= start
+    if end is not None:
+        keep &= df["date"] <= end
+    return df[keep].reset_index(drop=True)
+
+
+def _calories(exports, days, now):
+    cutoff = now - timedelta(days=days)
+
+    df = _date_range_df(days, now)
+    series = _series(exports, _METRIC["calories"])
+    _fill_daily(df, "calories", series, series.get("qty"), cutoff, "last")
     return df
 
 
+@timed(LOADER_SECONDS, loader="get_calories")
 def get_calories(data_dir, days=7):
     """Daily calorie intake for the last `days` days.
 
     Returns:
         DataFrame columns: date, calories
     """
-    exports = load_all_exports(data_dir)
-    cutoff = datetime.now() - timedelta(days=days)
+    return query(data_dir, {"calories": ("calories", days)})["calories"]
 
-    df = _date_range_df(days)
-    df["calories"] = float("nan")
 
-    for entry in exports.get(_METRIC["calories"], []):
-        if entry["_date"] < cutoff:
-            continue
-        d = pd.Timestamp(entry["_date"].date())
-        mask = df["date"] == d
-        if mask.any():
-            df.loc[mask, "calories"] = entry.get("qty", float("nan"))
+def _sleep_hours(series):
+    # Real Apple Watch data uses totalSleep; legacy/manual uses asleep; fallback to qty
+    total, asleep = series.get("totalSleep"), series.get("asleep")
+    return np.where(_truthy(total), total,
+                    np.where(_truthy(asleep), asleep, series.get("qty")))
+
 
+def _sleep(exports, days, now):
+    cutoff = now - timedelta(days=days + 1)
+
+    df = _date_range_df(days, now)
+    # Keep the longest sleep record for the day (handles nap entries)
+    series = _series(exports, _METRIC["sleep"])
+    _fill_daily(df, "sleep_hours", series, _sleep_hours(series), cutoff, "max")
     return df
 
 
+@timed(LOADER_SECONDS, loader="get_sleep")
 def get_sleep(data_dir, days=7):
     """Nightly sleep hours for the last `days` days.
 
@@ -192,28 +1205,26 @@ def get_sleep(data_dir, days=7):
         DataFrame columns: date, sleep_hours
         'date' is the morning wake-up date.
     """
-    exports = load_all_exports(data_dir)
-    cutoff = datetime.now() - timedelta(days=days + 1)
+    return query(data_dir, {"sleep": ("sleep", days)})["sleep"]
 
-    df = _date_range_df(days)
-    df["sleep_hours"] = float("nan")
 
-    for entry in exports.get(_METRIC["sleep"], []):
-        if entry["_date"] < cutoff:
-            continue
-        # Real Apple Watch data uses totalSleep; legacy/manual uses asleep; fallback to qty
-        hours = entry.get("totalSleep") or entry.get("asleep") or entry.get("qty", float("nan"))
-        d = pd.Timestamp(entry["_date"].date())
-        mask = df["date"] == d
-        if mask.any():
-            # Keep the longest sleep record for the day (handles nap entries)
-            existing = df.loc[mask, "sleep_hours"].values[0]
-            if pd.isna(existing) or hours > existing:
-                df.loc[mask, "sleep_hours"] = hours
+def _study_hours(series):
+    qty = series.get("qty")
+    return np.where(_truthy(qty), qty, 0.0) / 60.0
 
+
+def _study(exports, days, now):
+    cutoff = now - timedelta(days=days)
+
+    df = _date_range_df(days, now)
+
+    # Support both mindful_minutes (current) and mindful_session (legacy)
+    series = _series(exports, "mindful_minutes").concat(_series(exports, "mindful_session"))
+    _fill_daily(df, "study_hours", series, _study_hours(series), cutoff, "sum", fill=0.0)
     return df
 
 
+@timed(LOADER_SECONDS, loader="get_study_hours")
 def get_study_hours(data_dir, days=7):
     """Daily study time (mindfulness minutes) for the last `days` days.
 
@@ -222,21 +1233,46 @@ def get_study_hours(data_dir, days=7):
     Returns:
         DataFrame columns: date, study_hours
     """
-    exports = load_all_exports(data_dir)
-    cutoff = datetime.now() - timedelta(days=days)
+    return query(data_dir, {"study_hours": ("study_hours", days)})["study_hours"]
 
-    df = _date_range_df(days)
-    df["study_hours"] = 0.0
 
-    # Support both mindful_minutes (current) and mindful_session (legacy)
-    study_entries = exports.get("mindful_minutes", []) + exports.get("mindful_session", [])
-    for entry in study_entries:
-        if entry["_date"] < cutoff:
-            continue
-        minutes = entry.get("qty", 0.0) or 0.0
-        d = pd.Timestamp(entry["_date"].date())
-        mask = df["date"] == d
-        if mask.any():
-            df.loc[mask, "study_hours"] += minutes / 60.0
+# --- Batched queries ---
+# Query kinds accepted by query(); each matches the get_* function of the same name,
+# with the metrics it reads.
+_QUERIES = {
+    "body_composition": _body_composition,
+    "calories":         _calories,
+    "sleep":            _sleep,
+    "study_hours":      _study,
+}
+_QUERY_METRICS = {
+    "body_composition": (_METRIC["weight"], _METRIC["body_fat"], _METRIC["lean_mass"]),
+    "calories":         (_METRIC["calories"],),
+    "sleep":            (_METRIC["sleep"],),
+    "study_hours":      ("mindful_minutes", "mindful_session"),
+}
 
-    return df
+
+@timed(LOADER_SECONDS, loader="query")
+def query(data_dir, specs):
+    """Run several getters over a single load of the exports.
+
+    All results share one load and one "now", so a whole page render sees the
+    same data and the same date windows. Only the metrics and dates the specs
+    need are loaded.
+
+    Args:
+        specs: {key: (kind, days)} where kind is a key of _QUERIES, e.g.
+               {"sleep": ("sleep", 7), "weight": ("body_composition", 28)}
+
+    Returns:
+        dict: {key: DataFrame} -- each frame is what the matching get_* returns.
+    """
+    now = datetime.now()
+    # Whole days back from midnight, plus the extra night get_sleep looks at
+    longest = max((days for _, days in specs.values()), default=0) + 1
+    since = datetime.combine((now - timedelta(days=longest)).date(), datetime.min.time())
+    metrics = {m for kind, _ in specs.values() for m in _QUERY_METRICS[kind]}
+
+    exports = load_metrics(data_dir, since=since, metrics=metrics)
+    return {key: _QUERIES[kind](exports, days, now) for key, (kind, days) in specs.items()}
@@ -0,0 +1,45 @@
+"""Downsampling for long time-series charts.
+
+lttb() implements Largest-Triangle-Three-Buckets (Steinarsson, 2013): it keeps
+the first and last points and, from each of n-2 equal-count buckets in between,
+the point forming the largest triangle with the point kept from the previous
+bucket and the mean of the next one. Peaks, dips and the overall shape survive
+at a fraction of the points, which a plain stride or a bucket mean would lose.
+"""
+
+import numpy as np
+
+
+def lttb(x, y, n):
+    """Indices of the n points of (x, y) LTTB keeps; all of them if len(x) <= n.
+
+    x must be sorted ascending and numeric (convert datetimes with .astype("int64")
+    or similar); y must not contain NaN.
+    """
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        raise ValueError("lttb needs n >= 3")
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+
+    # Bucket edges over the interior points 1 .. size-2
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    keep = np.empty(n, dtype=int)
+    keep[0], keep[-1] = 0, size - 1
+    prev = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Mean of the next bucket (the last point for the final bucket)
+        if i + 2 < len(edges):
+            nxt = slice(hi, edges[i + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs(
+            (x[prev] - cx) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (cy - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
@@ -0,0 +1,306 @@
+"""Columnar store for Apple Health metrics.
+
+Raw Health Auto Export payloads (one JSON file per webhook POST) are folded into
+compact per-metric arrays by apple_health.compact_exports(), so reads touch one
+file per metric instead of every export ever received.
+
+Layout under apple-health/store/:
+    <metric_name>.npz   - parallel arrays sorted by _ts, one row per reading:
+                              _ts      datetime64[s]  reading time (tz offset stripped)
+                              _utc     datetime64[s]  the same instant in UTC (= _ts
+                                                      for dates without an offset)
+                              _src     int32          index into _sources
+                              <field>  float64        qty, totalSleep, asleep, ... (NaN = absent)
+                          plus _sources, the sorted export filenames rows came from
+                          (sorted, so comparing codes compares filenames)
+    folded.json         - {filename: [mtime_ns, size]} of every export folded in
+    ingested.json       - {ingest_id: sha256} of recent webhook payloads, oldest
+                          first (modules/ingest.py skips exact repeats)
+    sections.json       - {filename: [digest, ...]} of the items outside "metrics"
+                          ("workouts", ...) in each folded export, so ingest can
+                          tell new ones from resends
+    format              - FORMAT the store was written in; an older store is
+                          rebuilt from the exports (apple_health._fold_exports)
+
+Deduplication matches apple_health.load_metrics: one row per instant (_utc, so
+02:30 +1100 and 02:30 +1000 on the night clocks go back are two readings), and
+the newest export file (highest filename) wins. Keeping _src per row makes the
+rule exact even when exports are folded out of order.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import threading
+
+import numpy as np
+
+STORE_DIRNAME = "store"
+_FOLDED_FILE = "folded.json"
+_INGESTED_FILE = "ingested.json"
+_SECTIONS_FILE = "sections.json"
+_FORMAT_FILE = "format"
+FORMAT = 2   # bump when the columns change
+_EXT = ".npz"
+_LOCK_FILE = ".lock"
+
+_thread_lock = threading.Lock()
+_folded: dict = {}   # folded.json path -> (file identity, parsed)
+
+
+def store_dir(ah_dir):
+    """Path of the store directory inside apple-health/."""
+    return os.path.join(ah_dir, STORE_DIRNAME)
+
+
+@contextlib.contextmanager
+def locked(ah_dir):
+    """Hold the store's write lock, across threads and processes (flock on store/.lock).
+
+    Writers (compaction, webhook ingest) take it around read-merge-write so no
+    fold is lost. Readers never need it: every file is replaced atomically.
+    """
+    os.makedirs(store_dir(ah_dir), exist_ok=True)
+    with _thread_lock, open(os.path.join(store_dir(ah_dir), _LOCK_FILE), "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _replace_atomically(path, write):
+    """Call write(tmp_path) then rename over `path`, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # np.savez appends .npz unless the name already ends with it
+    tmp = f"{path}.{os.getpid()}.tmp{_EXT}"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _identity(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def is_current(ah_dir):
+    """False if the store was written in an older FORMAT and has to be rebuilt."""
+    try:
+        with open(os.path.join(store_dir(ah_dir), _FORMAT_FILE)) as fh:
+            return int(fh.read()) == FORMAT
+    except (OSError, ValueError):
+        # Stores from before the format was recorded have folded.json but no format
+        return not os.path.exists(os.path.join(store_dir(ah_dir), _FOLDED_FILE))
+
+
+def reset(ah_dir):
+    """Remove every metric file and the fold bookkeeping, to rebuild the store.
+
+    ingested.json is kept: the payloads it lists are in the exports.
+    """
+    for path in metric_files(ah_dir, any_format=True).values():
+        os.remove(path)
+    for name in (_FOLDED_FILE, _SECTIONS_FILE, _FORMAT_FILE):
+        try:
+            os.remove(os.path.join(store_dir(ah_dir), name))
+        except FileNotFoundError:
+            pass
+
+
+def read_folded(ah_dir):
+    """Return {filename: [mtime_ns, size]} of exports already in the store.
+
+    Every read checks it, so it is only parsed again when the file changes; the
+    dict is shared between calls and must not be modified. A store in an older
+    FORMAT holds nothing.
+    """
+    path = os.path.join(store_dir(ah_dir), _FOLDED_FILE)
+    try:
+        identity = _identity(path)
+    except OSError:
+        return {}
+    if not is_current(ah_dir):
+        return {}
+    cached = _folded.get(path)
+    if cached is not None and cached[0] == identity:
+        return cached[1]
+    try:
+        with open(path) as fh:
+            folded = json.load(fh)
+    except (OSError, ValueError):
+        folded = {}
+    _folded[path] = (identity, folded)
+    return folded
+
+
+def write_folded(ah_dir, folded):
+    """Write folded.json, last of a fold's files; a new store also gets its format."""
+    def _write(tmp):
+        with open(tmp, "w") as fh:
+            json.dump(folded, fh, separators=(",", ":"), sort_keys=True)
+
+    new = not os.path.exists(os.path.join(store_dir(ah_dir), _FOLDED_FILE))
+    _replace_atomically(os.path.join(store_dir(ah_dir), _FOLDED_FILE), _write)
+    if new:
+        def _write_format(tmp):
+            with open(tmp, "w") as fh:
+                fh.write(str(FORMAT))
+
+        _replace_atomically(os.path.join(store_dir(ah_dir), _FORMAT_FILE), _write_format)
+
+
+def read_ingested(ah_dir):
+    """Return {ingest_id: payload_sha256} of recent webhook payloads, oldest first."""
+    try:
+        with open(os.path.join(store_dir(ah_dir), _INGESTED_FILE)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_ingested(ah_dir, ingested):
+    def _write(tmp):
+        with open(tmp, "w") as fh:
+            json.dump(ingested, fh, separators=(",", ":"))
+
+    _replace_atomically(os.path.join(store_dir(ah_dir), _INGESTED_FILE), _write)
+
+
+def read_sections(ah_dir):
+    """Return {filename: [item digest, ...]} of the folded exports that have non-metric items."""
+    try:
+        with open(os.path.join(store_dir(ah_dir), _SECTIONS_FILE)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_sections(ah_dir, sections):
+    def _write(tmp):
+        with open(tmp, "w") as fh:
+            json.dump(sections, fh, separators=(",", ":"), sort_keys=True)
+
+    _replace_atomically(os.path.join(store_dir(ah_dir), _SECTIONS_FILE), _write)
+
+
+def metric_files(ah_dir, any_format=False):
+    """Return {metric_name: path} for every metric in the store.
+
+    Empty for a store in an older FORMAT, unless `any_format`.
+    """
+    sdir = store_dir(ah_dir)
+    if not os.path.isdir(sdir) or not (any_format or is_current(ah_dir)):
+        return {}
+    return {
+        f[: -len(_EXT)]: os.path.join(sdir, f)
+        for f in os.listdir(sdir)
+        if f.endswith(_EXT) and ".tmp" not in f
+    }
+
+
+def read_metric(path):
+    """Load one metric file as {column: ndarray}."""
+    with np.load(path, allow_pickle=False) as npz:
+        return {k: npz[k] for k in npz.files}
+
+
+def write_metric(ah_dir, name, columns):
+    path = os.path.join(store_dir(ah_dir), name + _EXT)
+    _replace_atomically(path, lambda tmp: np.savez(tmp, **columns))
+
+
+def source_columns(src, n):
+    """The _src/_sources pair for `n` rows that all came from export `src`."""
+    return {"_src": np.zeros(n, dtype="int32"), "_sources": np.array([src])}
+
+
+def _empty_columns():
+    return {"_ts": np.array([], dtype="datetime64[s]"),
+            "_utc": np.array([], dtype="datetime64[s]"),
+            "_src": np.array([], dtype="int32"),
+            "_sources": np.array([], dtype=str)}
+
+
+def concat_columns(chunks):
+    """Concatenate column dicts, rows in chunk order.
+
+    _src is re-coded against the union of the chunks' source tables; fields
+    missing from a chunk are filled with NaN.
+    """
+    if not chunks:
+        return _empty_columns()
+    all_sources = np.unique(np.concatenate([c["_sources"] for c in chunks]))
+    fields = sorted({k for c in chunks for k in c if not k.startswith("_")})
+    out = {
+        "_ts": np.concatenate([c["_ts"] for c in chunks]).astype("datetime64[s]"),
+        "_utc": np.concatenate([c["_utc"] for c in chunks]).astype("datetime64[s]"),
+        "_src": np.concatenate([
+            np.searchsorted(all_sources, c["_sources"])[c["_src"]] for c in chunks
+        ]).astype("int32"),
+        "_sources": all_sources,
+    }
+    for field in fields:
+        out[field] = np.concatenate([
+            c.get(field, np.full(len(c["_ts"]), np.nan)) for c in chunks
+        ]).astype("float64")
+    return out
+
+
+def merge_columns(existing, incoming):
+    """Merge two column dicts, keeping the newest-file row for each instant (_utc).
+
+    For rows with the same instant and source file the first to arrive wins
+    (existing before incoming, then input order), matching the first-entry-wins
+    rule inside one export even when a file is folded in several batches.
+    drop_source() a file's rows before re-folding it. Fields missing on either
+    side are filled with NaN. The result is sorted by _ts, then _utc.
+    """
+    merged = concat_columns([existing if existing is not None else _empty_columns(), incoming])
+    if not len(merged["_ts"]):
+        return merged
+
+    # Stable sort by (_utc, _src). Keep the first row of each (_utc, _src) run,
+    # then the last (newest source) row of each _utc.
+    order = np.lexsort((merged["_src"], merged["_utc"]))
+    utc, src = merged["_utc"][order], merged["_src"][order]
+    first_of_pair = np.append(True, (utc[1:] != utc[:-1]) | (src[1:] != src[:-1]))
+    order, utc = order[first_of_pair], utc[first_of_pair]
+    rows = order[np.append(utc[1:] != utc[:-1], True)]
+    # Back to wall-clock order; only differs from _utc order across offset changes
+    rows = rows[np.lexsort((merged["_utc"][rows], merged["_ts"][rows]))]
+    return select_rows(merged, rows)
+
+
+def select_rows(columns, rows):
+    """Subset of a column dict by index array or boolean mask (_sources is kept)."""
+    return {k: (v if k == "_sources" else v[rows]) for k, v in columns.items()}
+
+
+def without_sources(columns, srcs):
+    """Columns minus every row that came from one of the exports in `srcs`."""
+    codes = np.flatnonzero(np.isin(columns["_sources"], list(srcs)))
+    if not codes.size:
+        return columns
+    return select_rows(columns, ~np.isin(columns["_src"], codes))
+
+
+def prune_sources(columns):
+    """Columns with _sources cut down to the exports some row still comes from.
+
+    Rows of a file that lost every timestamp to newer files, or were dropped, leave
+    its name behind; pruning before each write keeps the table to live sources.
+    """
+    used, codes = np.unique(columns["_src"], return_inverse=True)
+    return {**columns, "_src": codes.reshape(-1).astype("int32"),
+            "_sources": columns["_sources"][used]}
+
+
+def drop_source(columns_by_metric, src):
+    """Remove every row that came from export `src`, in place, across all metrics."""
+    for name, columns in columns_by_metric.items():
+        columns_by_metric[name] = without_sources(columns, [src])
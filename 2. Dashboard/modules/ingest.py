@@ -0,0 +1,474 @@
+"""Asynchronous ingestion of Health Auto Export webhook payloads.
+
+The /api/health-export handler copies the request body to a spool file in
+apple-health/.spool/ a chunk at a time (spool(); bodies over INGEST_MAX_BODY_MB
+are refused) and submit()s it; a background writer thread parses it from there,
+saves it as apple-health/export_<ingest id>.json.gz
+(compact JSON; EXPORT_COMPRESSION picks gzip, zstd or none) and folds it into
+the store, so a large push never holds the request (or the iOS
+client) for the write. The queue is bounded: when it is full submit() refuses
+and the handler answers 429 so the client retries later instead of the process
+buffering without limit.
+
+Health Auto Export resends its whole window on every push, so the writer only
+saves what is new: a body byte-for-byte identical to one of the last
+_INGESTED_KEEP (sha256 of the spooled, gunzipped bytes) is skipped outright, and
+otherwise entries the store already holds unchanged, and workouts (or other
+items beside "metrics") a folded export already holds, are dropped
+(apple_health.new_entries) before the file is written. The hash only catches
+exact resends -- the same data with different key order or whitespace hashes
+differently -- but those still write nothing, as everything is then unchanged.
+A push with nothing new writes nothing and its id reports "duplicate", so
+stored volume follows the new data rather than the push count. Only that
+reduced payload is kept; there is no copy of the raw body.
+
+Neither side holds a whole large body: spools up to the Apple Health stream
+threshold are parsed in memory, bigger ones are parsed, filtered and written
+incrementally (apple_health.iter_export_parts / iter_new_entries), so peak
+memory does not grow with the payload.
+
+Each process has its own queue and writer (started on first use, so it is safe
+to import before gunicorn forks). Payloads still queued at exit are written
+before the process ends, up to DRAIN_TIMEOUT_S. A process holds an flock on each
+spool file from the first byte until its writer is done with it, so a body
+already answered 202 whose process died is recognisable as unowned: recover()
+queues those again when a worker starts.
+"""
+
+import atexit
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from modules import apple_health, health_store, metrics
+
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+MAX_BODY_BYTES = int(os.getenv("INGEST_MAX_BODY_MB", "512")) * 1024 * 1024
+COMPRESSION = os.getenv("EXPORT_COMPRESSION", "gzip")
+EXTENSIONS = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+DRAIN_TIMEOUT_S = 30
+_STATUS_KEEP = 256   # recent ingest ids whose status this process remembers
+_INGESTED_KEEP = 1000   # recent payload hashes checked for exact repeats
+_CHUNK = 1024 * 1024
+SPOOL_DIRNAME = ".spool"
+
+_log = logging.getLogger(__name__)
+
+if COMPRESSION not in EXTENSIONS:
+    raise ValueError(f"EXPORT_COMPRESSION must be one of {sorted(EXTENSIONS)}")
+if COMPRESSION == "zstd":
+    try:
+        import zstandard  # noqa: F401  (optional; checked here so no payload is lost later)
+    except ImportError:
+        _log.warning("EXPORT_COMPRESSION=zstd but zstandard is not installed; using gzip")
+        COMPRESSION = "gzip"
+
+_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+_status: OrderedDict = OrderedDict()   # ingest id -> "queued" | "saved" | "duplicate" | "failed"
+_claims: dict = {}   # spool path -> open file holding its flock, while this process owns it
+
+
+class PayloadTooLarge(ValueError):
+    """The request body is over MAX_BODY_BYTES (after gunzipping)."""
+
+
+def new_ingest_id():
+    """Receive time plus a random suffix: unique, and sorts in arrival order."""
+    return f"{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def export_filename(ingest_id, compression=None):
+    return f"export_{ingest_id}{EXTENSIONS[compression or COMPRESSION]}"
+
+
+def _open_compressed(path, compression):
+    """Binary file object writing `path` through the compressor."""
+    if compression == "gzip":
+        # mtime=0 keeps the bytes a function of the payload alone
+        return gzip.GzipFile(path, "wb", compresslevel=6, mtime=0)
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+    return open(path, "wb")
+
+
+def write_export_chunks(ah_dir, ingest_id, chunks, compression=None):
+    """Atomically save the JSON byte `chunks` as ah_dir/export_<ingest_id>.<ext>; return the path."""
+    compression = compression or COMPRESSION
+    os.makedirs(ah_dir, exist_ok=True)
+    filename = export_filename(ingest_id, compression)
+    out_path = os.path.join(ah_dir, filename)
+    # Hidden and not an export extension, so readers never mistake it for one
+    tmp = os.path.join(ah_dir, f".{filename}.{os.getpid()}.tmp")
+    try:
+        with _open_compressed(tmp, compression) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out_path
+
+
+def write_export(ah_dir, ingest_id, payload, compression=None):
+    """Atomically save `payload` as ah_dir/export_<ingest_id>.<ext>; return the path."""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return write_export_chunks(ah_dir, ingest_id, [body], compression)
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def export_chunks(parts):
+    """JSON chunks, for write_export_chunks(), of an export assembled from parts.
+
+    `parts` are apple_health.iter_export_parts() parts with entries grouped into
+    ("entries", metric_name, [entry, ...]) batches. A metric object is written
+    from its batches and closed by its ("metric", name, header) part, and left
+    out if it got no entries; ("section", key, item) parts become the items of
+    list `key` beside "metrics" and ("value", key, value) a plain key. The parts
+    of one key must be contiguous, as they are in any export.
+    """
+    yield b'{"data":{'
+    sep, item_sep = b"", b""   # before the next key / the next item of the open list
+    open_list, written = None, set()
+    metric = None              # name of the metric object being written
+    for kind, name, content in parts:
+        key = "metrics" if kind in ("entries", "metric") else name
+        if (kind == "entries" and not content) or (kind == "metric" and metric is None):
+            continue
+        if key != open_list:
+            if key in written:
+                raise ValueError(f"export parts for {key!r} are not contiguous")
+            if metric is not None:
+                yield b"]," + _dumps({"name": metric})[1:]
+                metric = None
+            if open_list is not None:
+                yield b"]"
+            written.add(key)
+            open_list = key if kind != "value" else None
+            yield sep + _dumps(key) + (b":[" if open_list else b":")
+            sep, item_sep = b",", b""
+        if kind == "entries":
+            if metric is not None and metric != name:
+                yield b"]," + _dumps({"name": metric})[1:]
+                metric = None
+            yield (b"," if metric else item_sep + b'{"data":[') + b",".join(map(_dumps, content))
+            metric, item_sep = name, b","
+        elif kind == "metric":
+            yield b"]," + _dumps({**content, "name": name})[1:]
+            metric = None
+        elif kind == "section":
+            yield item_sep + _dumps(content)
+            item_sep = b","
+        else:
+            yield _dumps(content)
+    if metric is not None:
+        yield b"]," + _dumps({"name": metric})[1:]
+    if open_list is not None:
+        yield b"]"
+    yield b"}}"
+
+
+def _counted(parts, counts, key):
+    """Pass export parts through, adding up their entries and section items in counts[key]."""
+    for part in parts:
+        kind, _, content = part
+        if kind in ("entry", "section"):
+            counts[key] += 1
+        elif kind == "entries":
+            counts[key] += len(content)
+        yield part
+
+
+def spool_dir(data_dir):
+    return os.path.join(data_dir, "apple-health", SPOOL_DIRNAME)
+
+
+def spool_path(data_dir, ingest_id):
+    return os.path.join(spool_dir(data_dir), f"{ingest_id}.json")
+
+
+def spool(data_dir, ingest_id, stream, gzipped=False):
+    """Copy a request body to its spool file in chunks; return the path.
+
+    gzipped bodies are decompressed on the way. Raises PayloadTooLarge past
+    MAX_BODY_BYTES and ValueError if the body is not gzip (when gzipped) or does
+    not start like a JSON object. On any failure, a dropped connection included,
+    the spool file is removed.
+    """
+    path = spool_path(data_dir, ingest_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    source = gzip.GzipFile(fileobj=stream, mode="rb") if gzipped else stream
+    size, head = 0, b""
+    out = open(path, "wb")
+    # Locked before the first byte, so recover() never takes a body still arriving
+    fcntl.flock(out, fcntl.LOCK_EX)
+    _claims[path] = out
+    spooled = False
+    try:
+        while True:
+            try:
+                chunk = source.read(_CHUNK)
+            except (OSError, EOFError) as exc:
+                raise ValueError("invalid gzip body") from exc
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise PayloadTooLarge(f"body over {MAX_BODY_BYTES // (1024 * 1024)} MB")
+            if not head:
+                head = chunk.lstrip()[:1]
+            out.write(chunk)
+        out.flush()
+        if not head:
+            raise ValueError("no JSON body")
+        if head != b"{":
+            raise ValueError("expected a JSON object")
+        spooled = True
+    finally:
+        if not spooled:
+            _discard(path)
+    return path
+
+
+def _claim(path):
+    """Take the flock of a spool file no live process owns; False if one does.
+
+    Also False if the file is gone or still empty (just created by a spool() that
+    has not locked it yet).
+    """
+    try:
+        fh = open(path, "rb")
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return False
+    st = os.fstat(fh.fileno())
+    if not st.st_nlink or not st.st_size:
+        fh.close()
+        return False
+    _claims[path] = fh
+    return True
+
+
+def _discard(path):
+    """Remove a spool file this process owns, then let go of its lock."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    fh = _claims.pop(path, None)
+    if fh is not None:
+        fh.close()
+
+
+def in_use(path):
+    """True if some process owns the spool file: it is still arriving or is queued."""
+    if path in _claims:
+        return True
+    try:
+        with open(path, "rb") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remember(ah_dir, ingest_id, digest):
+    """Record a handled payload's hash in the store's ingested.json."""
+    with health_store.locked(ah_dir):
+        ingested = health_store.read_ingested(ah_dir)
+        ingested[ingest_id] = digest
+        health_store.write_ingested(ah_dir, dict(list(ingested.items())[-_INGESTED_KEEP:]))
+
+
+def _saved_path(data_dir, ingest_id):
+    """Path of the export saved for `ingest_id` in any format, or None."""
+    ah_dir = os.path.join(data_dir, "apple-health")
+    for compression in EXTENSIONS:
+        path = os.path.join(ah_dir, export_filename(ingest_id, compression))
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _set_status(ingest_id, state):
+    _status[ingest_id] = state
+    _status.move_to_end(ingest_id)
+    while len(_status) > _STATUS_KEEP:
+        _status.popitem(last=False)
+
+
+def full():
+    """True if submit() would be refused right now (checked before spooling a body)."""
+    return _queue.full()
+
+
+def submit(data_dir, ingest_id, spooled, on_saved=None):
+    """Queue a spool()ed body for saving; False (and the spool removed) if the queue is full.
+
+    on_saved(path), if given, is called by the writer after the file is on disk.
+    """
+    _ensure_writer()
+    # Before the put: the writer may finish the job before put_nowait returns
+    _set_status(ingest_id, "queued")
+    metrics.INGEST_QUEUE_DEPTH.inc()
+    try:
+        _queue.put_nowait((data_dir, ingest_id, spooled, on_saved))
+    except queue.Full:
+        _status.pop(ingest_id, None)
+        metrics.INGEST_QUEUE_DEPTH.dec()
+        _discard(spooled)
+        return False
+    return True
+
+
+def recover(data_dir, on_saved=None):
+    """Queue spool files whose process died after answering 202; return how many.
+
+    Each file is claimed (its flock) first, so when several workers start at once
+    exactly one takes it, and bodies other processes are still receiving or have
+    queued are left alone. Blocks while the queue is full: call it off the request
+    path (app.start_ingest_recovery).
+    """
+    if not os.path.isdir(spool_dir(data_dir)):
+        return 0
+    recovered = 0
+    for name in sorted(os.listdir(spool_dir(data_dir))):
+        path = os.path.join(spool_dir(data_dir), name)
+        if not name.endswith(".json") or path in _claims or not _claim(path):
+            continue
+        ingest_id = name[: -len(".json")]
+        _ensure_writer()
+        _set_status(ingest_id, "queued")
+        metrics.INGEST_QUEUE_DEPTH.inc()
+        _queue.put((data_dir, ingest_id, path, on_saved))
+        recovered += 1
+    if recovered:
+        _log.info("Re-queued %d spooled payloads left by an earlier process", recovered)
+    return recovered
+
+
+def status(data_dir, ingest_id):
+    """State of an ingest id: "queued", "saved", "duplicate", "failed", or None.
+
+    Ids this process didn't receive (another gunicorn worker did) are looked up
+    on disk, so only "saved" or "duplicate" can be reported for them.
+    """
+    state = _status.get(ingest_id)
+    if state is None and _saved_path(data_dir, ingest_id) is not None:
+        state = "saved"
+    if state is None and ingest_id in health_store.read_ingested(os.path.join(data_dir, "apple-health")):
+        state = "duplicate"
+    return state
+
+
+def _save(data_dir, ingest_id, spooled):
+    """Write the spooled payload's new entries atomically, then fold them into the store.
+
+    Returns the path, or None if the payload held nothing new.
+    """
+    ah_dir = os.path.join(data_dir, "apple-health")
+    digest = _file_hash(spooled)
+    if digest in health_store.read_ingested(ah_dir).values():
+        metrics.INGEST_DUPLICATES.inc()
+        _remember(ah_dir, ingest_id, digest)
+        return None
+
+    payload = None
+    if os.path.getsize(spooled) <= apple_health.STREAM_THRESHOLD_BYTES:
+        with open(spooled, "rb") as fh:
+            payload = json.load(fh)
+        if not isinstance(payload, dict):
+            raise ValueError("expected a JSON object")
+        payload, kept, total = apple_health.new_entries(data_dir, payload)
+        out_path = write_export(ah_dir, ingest_id, payload) if kept else None
+    else:
+        counts = {"kept": 0, "total": 0}
+        with open(spooled, "rb") as fh:
+            parts = _counted(apple_health.iter_export_parts(fh), counts, "total")
+            parts = _counted(apple_health.iter_new_entries(data_dir, parts), counts, "kept")
+            out_path = write_export_chunks(ah_dir, ingest_id, export_chunks(parts))
+        kept, total = counts["kept"], counts["total"]
+        if not kept:
+            os.remove(out_path)
+            out_path = None
+    metrics.INGEST_ENTRIES.labels(outcome="stored").inc(kept)
+    metrics.INGEST_ENTRIES.labels(outcome="skipped").inc(total - kept)
+
+    if out_path is not None:
+        metrics.WEBHOOK_BYTES_WRITTEN.inc(os.path.getsize(out_path))
+        # Normalise once into the columnar store so page loads never parse this file.
+        # Nightly compaction retries on failure.
+        apple_health.ingest_export(data_dir, os.path.basename(out_path), payload)
+    _remember(ah_dir, ingest_id, digest)
+    return out_path
+
+
+def _run():
+    while True:
+        data_dir, ingest_id, spooled, on_saved = _queue.get()
+        metrics.INGEST_QUEUE_DEPTH.dec()
+        try:
+            with metrics.INGEST_WRITE_SECONDS.time():
+                path = _save(data_dir, ingest_id, spooled)
+            _set_status(ingest_id, "saved" if path else "duplicate")
+            if path and on_saved is not None:
+                on_saved(path)
+        except Exception:
+            # Saved-but-not-folded still counts as saved: compaction folds it later
+            saved = _saved_path(data_dir, ingest_id) is not None
+            _set_status(ingest_id, "saved" if saved else "failed")
+            _log.exception("Ingest %s failed", ingest_id)
+        finally:
+            _discard(spooled)
+            _queue.task_done()
+
+
+def _ensure_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run, name="ingest-writer", daemon=True)
+            _writer.start()
+
+
+def drain(timeout=DRAIN_TIMEOUT_S):
+    """Wait until every queued payload is handled; False if `timeout` ran out."""
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+atexit.register(drain)
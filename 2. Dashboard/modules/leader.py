@@ -0,0 +1,32 @@
+"""Leader election between worker processes with a file lock.
+
+Under gunicorn every worker imports app.py, but scheduled jobs must run once.
+Each worker calls acquire() after forking; the first to flock the lock file holds
+it for the rest of its life and becomes the leader. The OS drops the lock when
+that process exits, and the replacement worker gunicorn starts picks it up.
+"""
+
+import fcntl
+import os
+
+_held: dict = {}   # lock path -> open file keeping the lock
+
+
+def acquire(path):
+    """Try to become leader for `path` without blocking; True if this process is."""
+    if path in _held:
+        return True
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fh = open(path, "a+")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return False
+    # Record the holder for anyone inspecting the file
+    fh.seek(0)
+    fh.truncate()
+    fh.write(f"{os.getpid()}\n")
+    fh.flush()
+    _held[path] = fh
+    return True
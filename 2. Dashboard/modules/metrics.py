@@ -0,0 +1,105 @@
+"""Prometheus metrics for the dashboard, exposed as text on /metrics.
+
+Under gunicorn every worker records its own samples; gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at a shared directory so exposition() reports the sum
+over all workers. Without it (python app.py) the process's own registry is used.
+
+    dashboard_card_render_seconds{card}        layout() calls (render-cache misses)
+    dashboard_cards_served_total{card,source}  from the snapshot / rendered live
+    dashboard_card_fallbacks_total{card,reason} placeholders shown: timeout / error
+    apple_health_loader_seconds{loader}        apple_health.get_* and query()
+    health_export_request_seconds              /api/health-export handler
+    health_export_requests_total{status}       webhook responses by HTTP status
+    health_export_bytes_received_total         request bodies
+    health_export_bytes_written_total          export files written to disk
+    health_export_queue_depth                  payloads waiting for the writer
+    health_export_write_seconds                writer: save + fold one payload
+    health_export_entries_total{outcome}       payload entries: stored / skipped
+    health_export_duplicates_total             payloads identical to a recent one
+"""
+
+import functools
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Card renders and loads run from milliseconds (cache hits) to seconds (cold)
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CARD_RENDER_SECONDS = Histogram(
+    "dashboard_card_render_seconds", "Time spent in a card's layout() call",
+    ["card"], buckets=_BUCKETS,
+)
+CARDS_SERVED = Counter(
+    "dashboard_cards_served_total", "Cards served, by where the content came from",
+    ["card", "source"],
+)
+CARD_FALLBACKS = Counter(
+    "dashboard_card_fallbacks_total", "Cards replaced by their placeholder",
+    ["card", "reason"],
+)
+LOADER_SECONDS = Histogram(
+    "apple_health_loader_seconds", "Time spent in an Apple Health loader",
+    ["loader"], buckets=_BUCKETS,
+)
+WEBHOOK_SECONDS = Histogram(
+    "health_export_request_seconds", "Time spent handling /api/health-export",
+    buckets=_BUCKETS,
+)
+WEBHOOK_REQUESTS = Counter(
+    "health_export_requests_total", "/api/health-export responses", ["status"],
+)
+WEBHOOK_BYTES_RECEIVED = Counter(
+    "health_export_bytes_received_total", "Request body bytes received by the webhook",
+)
+WEBHOOK_BYTES_WRITTEN = Counter(
+    "health_export_bytes_written_total", "Export file bytes written by the webhook",
+)
+INGEST_QUEUE_DEPTH = Gauge(
+    "health_export_queue_depth", "Webhook payloads waiting to be written",
+    multiprocess_mode="livesum",
+)
+INGEST_WRITE_SECONDS = Histogram(
+    "health_export_write_seconds", "Time to save and fold one webhook payload",
+    buckets=_BUCKETS,
+)
+
+INGEST_ENTRIES = Counter(
+    "health_export_entries_total", "Webhook payload entries, stored or skipped as unchanged",
+    ["outcome"],
+)
+INGEST_DUPLICATES = Counter(
+    "health_export_duplicates_total", "Webhook payloads identical to a recent one (not saved)",
+)
+
+
+def timed(histogram, **labels):
+    """Decorator: observe each call's duration in histogram (with labels, if any)."""
+    metric = histogram.labels(**labels) if labels else histogram
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metric.time():
+                return fn(*args, **kwargs)
+        return wrapper
+    return wrap
+
+
+def exposition():
+    """(body, content type) of the current metrics in Prometheus text format."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,56 @@
+"""Render cache for dashboard cards.
+
+A card's component tree only changes when its data does (a webhook lands, a sync
+job writes) or when the day rolls over, so serve_layout() reuses each card until
+one of those happens instead of rebuilding every figure on every page hit.
+
+A source's version is the mtime of its directory under DATA_DIR and of the
+directories directly inside it (e.g. apple-health/store/). Writers in this app add
+files or atomically replace them (os.replace), which bumps the containing
+directory's mtime, so a few stat() calls stand in for reading any data. Hidden
+directories (parse caches like apple-health/.cache/) are ignored.
+"""
+
+import os
+from datetime import date
+
+_cards: dict = {}   # card name -> (key, component tree)
+
+
+def source_version(data_dir, source):
+    """Cheap change stamp for one data directory; None if it doesn't exist."""
+    path = os.path.join(data_dir, source)
+    try:
+        stamps = [("", os.stat(path).st_mtime_ns)]
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir() and not entry.name.startswith("."):
+                    stamps.append((entry.name, entry.stat().st_mtime_ns))
+    except OSError:
+        return None
+    return tuple(sorted(stamps))
+
+
+def data_version(data_dir, sources):
+    return tuple(source_version(data_dir, source) for source in sources)
+
+
+def card_key(data_dir, sources):
+    """Cache key for a card reading `sources`: today's date plus their versions."""
+    return (date.today(), data_version(data_dir, sources))
+
+
+def render(name, data_dir, sources, build):
+    """Return the cached tree for card `name`, calling build() if its data changed.
+
+    The version is taken before build() runs, so a write that lands mid-build
+    makes the next request rebuild rather than pinning stale content. Cached
+    trees are shared between requests and must not be mutated.
+    """
+    key = card_key(data_dir, sources)
+    cached = _cards.get(name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    tree = build()
+    _cards[name] = (key, tree)
+    return tree
@@ -0,0 +1,112 @@
+"""Retention for apple-health/: old raw exports are rolled into monthly archives.
+
+Every webhook push adds an export file, and every read lists and stats the
+directory, so left alone both grow forever. archive_exports() consolidates the
+raw exports of each month that ended more than RETENTION_DAYS ago into one
+export_<YYYY-MM>.<ext> (apple_health.consolidate_exports), folds it into the
+store in their place and deletes them (apple_health.replace_exports).
+
+The archive name sorts after every raw export of its month and before the next
+month's, so "highest filename wins" still resolves each (metric, timestamp) to
+the same reading. Only whole months are archived for the same reason: a raw file
+newer than the cutoff but in the same month would otherwise lose to the archive.
+
+The directory then holds at most RETENTION_DAYS-and-a-month of raw exports plus
+one archive per month. Spool files a dead process left behind are queued again
+when the next worker starts (ingest.recover); any no process owns a day later
+(empty or never recovered) are removed.
+"""
+
+import logging
+import os
+import re
+import time
+from datetime import date, timedelta
+
+from modules import apple_health, ingest
+
+RETENTION_DAYS = int(os.getenv("APPLE_HEALTH_RETENTION_DAYS", "30"))
+_SPOOL_MAX_AGE_S = 24 * 3600
+
+_RAW = re.compile(r"^export_(\d{4}-\d{2})-\d{2}T")   # export_<ingest id>.<ext>
+_ARCHIVE = re.compile(r"^export_(\d{4}-\d{2})\.")    # export_<YYYY-MM>.<ext>
+
+_log = logging.getLogger(__name__)
+
+
+def _next_month(month):
+    """First day of the month after "YYYY-MM"."""
+    year, mon = map(int, month.split("-"))
+    return date(year + mon // 12, mon % 12 + 1, 1)
+
+
+def _archivable(ah_dir, cutoff):
+    """{month: [filenames]} of months ended by `cutoff` that have raw exports.
+
+    An existing archive of such a month is included, so re-rolling keeps it.
+    """
+    raw: dict = {}
+    archives: dict = {}
+    for filename in os.listdir(ah_dir):
+        if not filename.endswith(apple_health.EXPORT_EXTENSIONS):
+            continue
+        match = _RAW.match(filename)
+        if match:
+            raw.setdefault(match.group(1), []).append(filename)
+            continue
+        match = _ARCHIVE.match(filename)
+        if match:
+            archives.setdefault(match.group(1), []).append(filename)
+    return {
+        month: files + archives.get(month, [])
+        for month, files in raw.items()
+        if _next_month(month) <= cutoff
+    }
+
+
+def archive_exports(data_dir, days=RETENTION_DAYS, today=None):
+    """Roll the raw exports of months that ended `days` or more ago into archives.
+
+    Returns:
+        int: raw export files replaced by an archive.
+    """
+    ah_dir = os.path.join(data_dir, "apple-health")
+    if not os.path.isdir(ah_dir):
+        return 0
+    cutoff = (today or date.today()) - timedelta(days=days)
+    replaced = 0
+    for month, filenames in sorted(_archivable(ah_dir, cutoff).items()):
+        try:
+            path = ingest.write_export_chunks(
+                ah_dir, month, ingest.export_chunks(apple_health.consolidate_exports(ah_dir, filenames))
+            )
+            if apple_health.replace_exports(data_dir, filenames, os.path.basename(path)):
+                replaced += sum(1 for f in filenames if _RAW.match(f))
+        except Exception:
+            # Raw files stay until an archive is folded; the next run retries
+            _log.exception("Archiving Apple Health exports for %s failed", month)
+    return replaced
+
+
+def sweep_spool(data_dir, max_age_s=_SPOOL_MAX_AGE_S):
+    """Delete webhook spool files older than `max_age_s` that no process owns. Returns how many."""
+    spool_dir = ingest.spool_dir(data_dir)
+    if not os.path.isdir(spool_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(spool_dir):
+        path = os.path.join(spool_dir, name)
+        try:
+            if time.time() - os.path.getmtime(path) > max_age_s and not ingest.in_use(path):
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def run(data_dir):
+    """Scheduled job: archive old exports and sweep stale spool files."""
+    archived = archive_exports(data_dir)
+    swept = sweep_spool(data_dir)
+    _log.info("Retention: %d exports archived, %d spool files removed", archived, swept)
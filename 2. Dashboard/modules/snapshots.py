@@ -0,0 +1,104 @@
+"""Precomputed dashboard snapshots on disk.
+
+A scheduled job (and every webhook ingest) renders each card and writes the
+component trees, figures included, as one JSON file under DATA_DIR:
+
+    dashboard-snapshots/snapshot_<YYYY-MM-DDTHH-MM-SS>.json
+        {"created": iso datetime,
+         "cards": {card name: {"key": render_cache.card_key() as JSON, "tree": ...}}}
+
+The newest file is the live one; older ones are kept briefly and pruned. A card is
+served from the snapshot only while its key still matches the data on disk, so a
+snapshot can lag behind a write but never shows stale content -- the card is
+rendered live instead. Snapshots survive restarts and are shared between worker
+processes, unlike the in-memory render cache.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from plotly.io.json import to_json_plotly
+
+from modules import render_cache
+
+SNAPSHOT_DIRNAME = "dashboard-snapshots"
+KEEP = 3
+_PREFIX = "snapshot_"
+
+_latest: dict = {}   # snapshot dir -> (filename, {card name: {"key", "tree"}})
+
+
+def snapshot_dir(data_dir):
+    return os.path.join(data_dir, SNAPSHOT_DIRNAME)
+
+
+def card_stamp(data_dir, sources):
+    """render_cache.card_key() in the form stored in a snapshot."""
+    return json.dumps(render_cache.card_key(data_dir, sources), default=str)
+
+
+def write(data_dir, cards):
+    """Save {card name: (stamp, tree)} as the newest snapshot; return its path."""
+    sdir = snapshot_dir(data_dir)
+    os.makedirs(sdir, exist_ok=True)
+    path = os.path.join(
+        sdir, f"{_PREFIX}{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}.json"
+    )
+    payload = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "cards": {name: {"key": stamp, "tree": tree}
+                  for name, (stamp, tree) in cards.items()},
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as fh:
+            fh.write(to_json_plotly(payload))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _prune(sdir)
+    return path
+
+
+def _snapshot_files(sdir):
+    try:
+        return sorted(f for f in os.listdir(sdir)
+                      if f.startswith(_PREFIX) and f.endswith(".json"))
+    except OSError:
+        return []
+
+
+def _prune(sdir):
+    for filename in _snapshot_files(sdir)[:-KEEP]:
+        try:
+            os.remove(os.path.join(sdir, filename))
+        except OSError:
+            pass
+
+
+def _load_latest(data_dir):
+    """Cards of the newest snapshot, read once per file; {} if there is none."""
+    sdir = snapshot_dir(data_dir)
+    files = _snapshot_files(sdir)
+    if not files:
+        return {}
+    cached = _latest.get(sdir)
+    if cached is not None and cached[0] == files[-1]:
+        return cached[1]
+    try:
+        with open(os.path.join(sdir, files[-1])) as fh:
+            cards = json.load(fh)["cards"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    _latest[sdir] = (files[-1], cards)
+    return cards
+
+
+def card(data_dir, name, sources):
+    """Snapshot tree for card `name` if it is still current, else None."""
+    entry = _load_latest(data_dir).get(name)
+    if entry is None or entry["key"] != card_stamp(data_dir, sources):
+        return None
+    return entry["tree"]
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Tests import modules/ the way app.py does, from 2. Dashboard/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import apple_health  # noqa: E402
+
+
+def export(*metrics):
+    """Export body of (name, [(date, qty), ...]) pairs."""
+    return {"data": {"metrics": [
+        {"name": name, "units": "kg", "data": [{"date": d, "qty": q} for d, q in rows]}
+        for name, rows in metrics
+    ]}}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    apple_health.clear_caches()
+    yield str(tmp_path)
+    apple_health.clear_caches()
@@ -0,0 +1,175 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from modules import apple_health, ingest
+
+NOW = datetime(2026, 3, 15, 13, 30, 0)
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+# --- Reference: the original per-entry getters, one reading at a time ---
+
+def _reference_exports(payloads):
+    """{metric: [entry, ...]} by (metric, wall-clock time), newest export first."""
+    metrics = {}
+    for _, payload in sorted(payloads.items(), reverse=True):
+        for metric in payload["data"]["metrics"]:
+            seen = metrics.setdefault(metric["name"], {})
+            for entry in metric["data"]:
+                dt = datetime.strptime(entry["date"][:19], "%Y-%m-%d %H:%M:%S")
+                seen.setdefault(dt, {**entry, "_date": dt})
+    return {name: sorted(entries.values(), key=lambda e: e["_date"])
+            for name, entries in metrics.items()}
+
+
+def _reference_frame(days):
+    dates = pd.date_range(start=(NOW - timedelta(days=days)).date(), end=NOW.date(), freq="D")
+    return pd.DataFrame({"date": pd.to_datetime(dates)})
+
+
+def _reference_body_composition(exports, days):
+    df = _reference_frame(days)
+    for col, name in (("weight_kg", "body_mass"), ("body_fat_pct", "body_fat_percentage"),
+                      ("lean_mass_kg", "lean_body_mass")):
+        df[col] = float("nan")
+        for entry in exports.get(name, []):
+            if entry["_date"] < NOW - timedelta(days=days):
+                continue
+            mask = df["date"] == pd.Timestamp(entry["_date"].date())
+            if mask.any():
+                df.loc[mask, col] = entry.get("qty", float("nan"))
+    return df
+
+
+def _reference_calories(exports, days):
+    df = _reference_frame(days)
+    df["calories"] = float("nan")
+    for entry in exports.get("dietary_energy_consumed", []):
+        if entry["_date"] < NOW - timedelta(days=days):
+            continue
+        mask = df["date"] == pd.Timestamp(entry["_date"].date())
+        if mask.any():
+            df.loc[mask, "calories"] = entry.get("qty", float("nan"))
+    return df
+
+
+def _reference_sleep(exports, days):
+    df = _reference_frame(days)
+    df["sleep_hours"] = float("nan")
+    for entry in exports.get("sleep_analysis", []):
+        if entry["_date"] < NOW - timedelta(days=days + 1):
+            continue
+        hours = entry.get("totalSleep") or entry.get("asleep") or entry.get("qty", float("nan"))
+        mask = df["date"] == pd.Timestamp(entry["_date"].date())
+        if mask.any():
+            existing = df.loc[mask, "sleep_hours"].values[0]
+            if pd.isna(existing) or hours > existing:
+                df.loc[mask, "sleep_hours"] = hours
+    return df
+
+
+def _reference_study_hours(exports, days):
+    df = _reference_frame(days)
+    df["study_hours"] = 0.0
+    for entry in exports.get("mindful_minutes", []) + exports.get("mindful_session", []):
+        if entry["_date"] < NOW - timedelta(days=days):
+            continue
+        minutes = entry.get("qty", 0.0) or 0.0
+        mask = df["date"] == pd.Timestamp(entry["_date"].date())
+        if mask.any():
+            df.loc[mask, "study_hours"] += minutes / 60.0
+    return df
+
+
+# --- Randomised exports ---
+
+def _maybe(rng, value):
+    """`value`, or now and then 0 or nothing at all."""
+    roll = rng.random()
+    return None if roll < 0.1 else 0.0 if roll < 0.2 else value
+
+
+def _entry(rng, name, date):
+    entry = {"date": date}
+    if name == "sleep_analysis":
+        for field in rng.sample(["totalSleep", "asleep", "qty"], rng.randint(0, 3)):
+            value = _maybe(rng, round(rng.uniform(0.5, 9.5), 2))
+            if value is not None:
+                entry[field] = value
+    else:
+        value = _maybe(rng, round(rng.uniform(1, 120), 1))
+        if value is not None:
+            entry["qty"] = value
+    return entry
+
+
+def _random_payloads(seed, files=5):
+    """Overlapping exports: a few fixed times a day, so the same reading is often
+    sent again (in another file, or twice in one) with a different value.
+
+    Each day has a single UTC offset, so equal wall-clock times are equal instants.
+    """
+    rng = random.Random(seed)
+    names = ["body_mass", "body_fat_percentage", "lean_body_mass", "dietary_energy_consumed",
+             "sleep_analysis", "mindful_minutes", "mindful_session"]
+    payloads = {}
+    for i in range(files):
+        metrics = []
+        for name in names:
+            data = []
+            for _ in range(rng.randint(0, 60)):
+                day = (NOW - timedelta(days=rng.randint(-1, 35))).replace(
+                    hour=rng.choice([0, 7, 12, 13, 22]), minute=rng.choice([0, 30]), second=0)
+                offset = "+1100" if day.toordinal() % 2 else "+1000"
+                data.append(_entry(rng, name, f"{day:%Y-%m-%d %H:%M:%S} {offset}"))
+            if data:
+                metrics.append({"name": name, "units": "x", "data": data})
+        payloads[f"export_2026-03-{10 + i:02d}T08-00-00"] = {"data": {"metrics": metrics}}
+    return payloads
+
+
+def _check(data_dir, payloads):
+    exports = _reference_exports(payloads)
+    apple_health.clear_caches()
+    for days in (7, 28):
+        pd.testing.assert_frame_equal(apple_health.get_body_composition(data_dir, days),
+                                      _reference_body_composition(exports, days), check_exact=True)
+        pd.testing.assert_frame_equal(apple_health.get_calories(data_dir, days),
+                                      _reference_calories(exports, days), check_exact=True)
+        pd.testing.assert_frame_equal(apple_health.get_sleep(data_dir, days),
+                                      _reference_sleep(exports, days), check_exact=True)
+        pd.testing.assert_frame_equal(apple_health.get_study_hours(data_dir, days),
+                                      _reference_study_hours(exports, days), check_exact=True)
+
+    both = apple_health.query(data_dir, {"sleep": ("sleep", 7), "weight": ("body_composition", 28)})
+    pd.testing.assert_frame_equal(both["sleep"], _reference_sleep(exports, 7), check_exact=True)
+    pd.testing.assert_frame_equal(both["weight"], _reference_body_composition(exports, 28),
+                                  check_exact=True)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_daily_getters_match_per_entry_semantics(data_dir, monkeypatch, seed):
+    monkeypatch.setattr(apple_health, "datetime", _FrozenDatetime)
+    ah_dir = os.path.join(data_dir, "apple-health")
+    payloads = _random_payloads(seed)
+    names = sorted(payloads)
+
+    # Straight from the exports, then half folded into the store, then all of it
+    for name in names[:3]:
+        ingest.write_export(ah_dir, name[len("export_"):], payloads[name])
+    _check(data_dir, {n: payloads[n] for n in names[:3]})
+    apple_health.compact_exports(data_dir)
+    for name in names[3:]:
+        ingest.write_export(ah_dir, name[len("export_"):], payloads[name])
+    _check(data_dir, payloads)
+    apple_health.compact_exports(data_dir)
+    _check(data_dir, payloads)
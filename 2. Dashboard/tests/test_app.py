@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from conftest import export
+from modules import apple_health, ingest, render_cache
+
+
+@pytest.fixture
+def dashboard(data_dir, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "DATA_DIR", data_dir)
+    monkeypatch.setattr(app, "PROGRESSIVE", True)
+    monkeypatch.setattr(app, "_health_query", {})
+    monkeypatch.setattr(render_cache, "_cards", {})
+    return app
+
+
+def _push(data_dir, ingest_id, rows):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    path = ingest.write_export(ah_dir, ingest_id, export(("body_mass", rows)))
+    apple_health.ingest_export(data_dir, os.path.basename(path))
+
+
+def test_card_revalidates_until_its_data_changes(dashboard, data_dir):
+    _push(data_dir, "2026-01-01T08-00-00", [("2026-01-01 07:00:00 +1100", 70.0)])
+    client = dashboard.server.test_client()
+
+    first = client.get("/api/cards/health")
+    assert first.status_code == 200 and first.get_json()["type"] == "Card"
+    etag = first.headers["ETag"]
+    assert client.get("/api/cards/health", headers={"If-None-Match": etag}).status_code == 304
+
+    fitness = client.get("/api/cards/fitness").headers["ETag"]
+    _push(data_dir, "2026-01-02T08-00-00", [("2026-01-02 07:00:00 +1100", 70.5)])
+    changed = client.get("/api/cards/health", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    # Cards whose sources did not change still revalidate
+    assert client.get("/api/cards/fitness", headers={"If-None-Match": fitness}).status_code == 304
+
+
+def test_layout_holds_nothing_time_dependent(dashboard):
+    client = dashboard.server.test_client()
+    layout = client.get(dashboard._LAYOUT_PATH)
+    # Week and "Generated" labels are filled in by the browser (assets/dashboard.js)
+    assert "Generated" not in layout.get_data(as_text=True)
+    assert client.get(dashboard._LAYOUT_PATH,
+                      headers={"If-None-Match": layout.headers["ETag"]}).status_code == 304
+
+
+def test_unknown_card(dashboard):
+    assert dashboard.server.test_client().get("/api/cards/nope").status_code == 404
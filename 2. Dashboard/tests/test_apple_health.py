@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+
+from conftest import export
+from modules import apple_health, health_store, ingest
+
+
+def _weights(data_dir):
+    series = apple_health.load_metrics(data_dir)["body_mass"]
+    return dict(zip(series.ts.astype(str), series.get("qty")))
+
+
+def test_overlapping_exports_newer_file_wins(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    ingest.write_export(ah_dir, "2026-01-02T08-00-00", export(("body_mass", [
+        ("2026-01-01 07:00:00 +1100", 70.0),
+        ("2026-01-02 07:00:00 +1100", 71.0),
+    ])))
+    ingest.write_export(ah_dir, "2026-01-03T08-00-00", export(("body_mass", [
+        ("2026-01-02 07:00:00 +1100", 71.5),   # resent with a corrected value
+        ("2026-01-03 07:00:00 +1100", 72.0),
+    ])))
+
+    expected = {
+        "2026-01-01T07:00:00": 70.0,
+        "2026-01-02T07:00:00": 71.5,
+        "2026-01-03T07:00:00": 72.0,
+    }
+    assert _weights(data_dir) == expected
+
+    # Same answer once both files are folded into the store
+    apple_health.compact_exports(data_dir)
+    apple_health.clear_caches()
+    assert _weights(data_dir) == expected
+
+
+def test_series_sorted_by_time(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    ingest.write_export(ah_dir, "2026-01-02T08-00-00", export(("body_mass", [
+        ("2026-01-02 07:00:00 +1100", 71.0),
+        ("2026-01-01 07:00:00 +1100", 70.0),
+    ])))
+    ts = apple_health.load_metrics(data_dir)["body_mass"].ts
+    assert np.all(ts[:-1] <= ts[1:])
+
+
+def test_streamed_parts_match_the_parsed_payload():
+    import io
+    import json
+
+    body = {"data": {
+        "metrics": [
+            {"data": [{"date": "2026-01-01 07:00:00 +1100", "qty": 70.0}],
+             "name": "body_mass", "units": "kg"},
+            {"name": "sleep_analysis", "data": [{"date": "2026-01-01", "asleep": 7.5, "source": "Watch"}]},
+            {"data": [{"date": "2026-01-01", "qty": 1}]},   # no name: dropped
+        ],
+        "workouts": [{"name": "Run", "route": [{"lat": -37.8, "lon": 144.9}]}, "note"],
+        "version": {"app": 7},
+    }}
+    streamed = list(apple_health.iter_export_parts(io.BytesIO(json.dumps(body).encode())))
+    assert streamed == list(apple_health._iter_payload_parts(body))
+    assert ("metric", "body_mass", {"name": "body_mass", "units": "kg"}) in streamed
+
+
+def test_readings_are_told_apart_by_instant(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    # Clocks go back at 03:00 +1100 on 5 April: 02:30 happens twice
+    ingest.write_export(ah_dir, "2026-04-05T08-00-00", export(("heart_rate", [
+        ("2026-04-05 02:30:00 +1100", 60.0),
+        ("2026-04-05 02:30:00 +1000", 58.0),
+    ])))
+    # A resend of the first reading stamped in another zone is the same reading
+    ingest.write_export(ah_dir, "2026-04-06T08-00-00", export(("heart_rate", [
+        ("2026-04-04 23:30:00 +0800", 61.0),
+    ])))
+    for _ in range(2):
+        series = apple_health.load_metrics(data_dir)["heart_rate"]
+        assert series.ts.astype(str).tolist() == ["2026-04-04T23:30:00", "2026-04-05T02:30:00"]
+        assert series.utc.astype(str).tolist() == ["2026-04-04T15:30:00", "2026-04-04T16:30:00"]
+        assert series.get("qty").tolist() == [61.0, 58.0]
+        apple_health.compact_exports(data_dir)
+        apple_health.clear_caches()
+
+
+def test_store_from_an_older_format_is_rebuilt(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    ingest.write_export(ah_dir, "2026-01-02T08-00-00", export(("body_mass", [
+        ("2026-01-01 07:00:00 +1100", 70.0),
+    ])))
+    apple_health.compact_exports(data_dir)
+    # What a store written before the _utc column looked like
+    path = health_store.metric_files(ah_dir)["body_mass"]
+    columns = health_store.read_metric(path)
+    del columns["_utc"]
+    np.savez(path, **columns)
+    os.remove(os.path.join(health_store.store_dir(ah_dir), "format"))
+    apple_health.clear_caches()
+
+    assert _weights(data_dir) == {"2026-01-01T07:00:00": 70.0}
+    assert "_utc" in health_store.read_metric(health_store.metric_files(ah_dir)["body_mass"])
+
+
+def test_parse_dates_layouts():
+    local, utc = apple_health._parse_dates([
+        "2026-01-02 07:00:00 +1100",   # the usual layout
+        "2026-01-02 07:00:00 -0530",
+        "2026-01-02 07:00:00",         # no offset: its own instant
+        "2026-01-02",                  # date only
+        "2026-01-02 +1100",            # date with an offset
+        "2026-1-2 7:05:09 +1100",      # single-digit fields
+        " 2026-01-02 07:00:00 +1100 ",
+        "",
+        "yesterday",
+        "2026-13-02 07:00:00 +1100",
+        None,
+    ])
+    assert local.astype(str).tolist() == [
+        "2026-01-02T07:00:00", "2026-01-02T07:00:00", "2026-01-02T07:00:00",
+        "2026-01-02T00:00:00", "2026-01-02T00:00:00", "2026-01-02T07:05:09",
+        "2026-01-02T07:00:00", "NaT", "NaT", "NaT", "NaT",
+    ]
+    assert utc.astype(str).tolist() == [
+        "2026-01-01T20:00:00", "2026-01-02T12:30:00", "2026-01-02T07:00:00",
+        "2026-01-02T00:00:00", "2026-01-01T13:00:00", "2026-01-01T20:05:09",
+        "2026-01-01T20:00:00", "NaT", "NaT", "NaT", "NaT",
+    ]
@@ -0,0 +1,124 @@
+import io
+import json
+import os
+
+import pytest
+from werkzeug.exceptions import ClientDisconnected
+
+from conftest import export
+from modules import apple_health, health_store, ingest
+
+DAY1 = ("2026-01-01 07:00:00 +1100", 70.0)
+DAY2 = ("2026-01-02 07:00:00 +1100", 71.0)
+
+
+def _push(data_dir, ingest_id, body):
+    spooled = ingest.spool(data_dir, ingest_id, io.BytesIO(json.dumps(body).encode()))
+    assert ingest.submit(data_dir, ingest_id, spooled)
+    assert ingest.drain(timeout=10)
+    return ingest.status(data_dir, ingest_id)
+
+
+def _exports(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    return sorted(f for f in os.listdir(ah_dir)
+                  if f.startswith("export_") and f.endswith(apple_health.EXPORT_EXTENSIONS))
+
+
+def _store_mtimes(data_dir):
+    files = health_store.metric_files(os.path.join(data_dir, "apple-health"))
+    return {name: os.stat(path).st_mtime_ns for name, path in files.items()}
+
+
+def test_unchanged_resend_writes_nothing(data_dir):
+    body = export(("body_mass", [DAY1, DAY2]))
+    assert _push(data_dir, "2026-01-02T08-00-00_a", body) == "saved"
+    files = _exports(data_dir)
+    store = _store_mtimes(data_dir)
+
+    assert _push(data_dir, "2026-01-02T09-00-00_b", body) == "duplicate"
+    assert _exports(data_dir) == files
+    assert _store_mtimes(data_dir) == store
+    assert not os.listdir(os.path.join(data_dir, "apple-health", ingest.SPOOL_DIRNAME))
+
+
+def test_overlapping_resend_stores_only_new_entries(data_dir):
+    assert _push(data_dir, "2026-01-02T08-00-00_a", export(("body_mass", [DAY1, DAY2]))) == "saved"
+    day3 = ("2026-01-03 07:00:00 +1100", 72.0)
+    assert _push(data_dir, "2026-01-03T08-00-00_b", export(("body_mass", [DAY1, DAY2, day3]))) == "saved"
+
+    newest = os.path.join(data_dir, "apple-health", _exports(data_dir)[-1])
+    with apple_health.open_export(newest) as fh:
+        saved = json.load(fh)
+    assert saved["data"]["metrics"][0]["data"] == [{"date": day3[0], "qty": day3[1]}]
+    assert len(apple_health.load_metrics(data_dir)["body_mass"]) == 3
+
+
+def test_spool_left_by_a_dead_process_is_recovered(data_dir):
+    # Written directly: no live process holds its lock, as after a crash
+    path = ingest.spool_path(data_dir, "2026-01-02T08-00-00_a")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as fh:
+        json.dump(export(("body_mass", [DAY1])), fh)
+    # A body this process is still handling is left alone
+    owned = ingest.spool(data_dir, "2026-01-02T08-00-01_b", io.BytesIO(b'{"data": {}}'))
+
+    assert ingest.recover(data_dir) == 1
+    assert ingest.drain(timeout=10)
+    assert ingest.status(data_dir, "2026-01-02T08-00-00_a") == "saved"
+    assert os.listdir(ingest.spool_dir(data_dir)) == [os.path.basename(owned)]
+    assert ingest.in_use(owned)
+    assert ingest.submit(data_dir, "2026-01-02T08-00-01_b", owned)
+    assert ingest.drain(timeout=10)
+
+
+def test_spool_removes_a_partial_body(data_dir):
+    class Disconnected(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell():
+                raise ClientDisconnected()
+            return super().read(1024)
+
+    with pytest.raises(ClientDisconnected):
+        ingest.spool(data_dir, "2026-01-02T08-00-00_a", Disconnected(b'{"data": {}}' * 1000))
+    assert not os.listdir(ingest.spool_dir(data_dir))
+
+
+WORKOUT = {"name": "Run", "start": "2026-01-02 06:00:00 +1100", "distance": {"qty": 5.1, "units": "km"}}
+
+
+def _saved(data_dir):
+    with apple_health.open_export(os.path.join(data_dir, "apple-health", _exports(data_dir)[-1])) as fh:
+        return json.load(fh)["data"]
+
+
+def test_new_workouts_are_saved_with_unchanged_metrics(data_dir):
+    body = export(("body_mass", [DAY1]))
+    assert _push(data_dir, "2026-01-02T08-00-00_a", {"data": {"workouts": [WORKOUT]}}) == "saved"
+    assert _push(data_dir, "2026-01-02T09-00-00_b", body) == "saved"
+
+    # Same metrics plus the stored workout and a new one: only the new workout is kept
+    second = {**WORKOUT, "start": "2026-01-03 06:00:00 +1100"}
+    body["data"]["workouts"] = [WORKOUT, second]
+    assert _push(data_dir, "2026-01-03T08-00-00_c", body) == "saved"
+    assert _saved(data_dir) == {"metrics": [], "workouts": [second]}
+    assert _push(data_dir, "2026-01-03T09-00-00_d", {"data": {"workouts": [second]}}) == "duplicate"
+
+
+def test_streamed_push_keeps_units_and_workouts(data_dir, monkeypatch):
+    monkeypatch.setattr(apple_health, "STREAM_THRESHOLD_BYTES", 0)
+    body = export(("body_mass", [DAY1, DAY2]))
+    body["data"]["workouts"] = [WORKOUT]
+    assert _push(data_dir, "2026-01-02T08-00-00_a", body) == "saved"
+    assert _saved(data_dir) == {
+        "metrics": [{"data": [{"date": d, "qty": q} for d, q in (DAY1, DAY2)],
+                     "name": "body_mass", "units": "kg"}],
+        "workouts": [WORKOUT],
+    }
+
+    body["data"]["metrics"][0]["data"].append({"date": "2026-01-03 07:00:00 +1100", "qty": 72.0})
+    assert _push(data_dir, "2026-01-03T08-00-00_b", body) == "saved"
+    assert _saved(data_dir) == {"metrics": [{
+        "data": [{"date": "2026-01-03 07:00:00 +1100", "qty": 72.0}], "name": "body_mass", "units": "kg",
+    }]}
+    assert _push(data_dir, "2026-01-03T09-00-00_c", {"data": {"workouts": [WORKOUT]}}) == "duplicate"
@@ -0,0 +1,91 @@
+import json
+import os
+import tracemalloc
+from datetime import date
+
+import numpy as np
+
+from conftest import export
+from modules import apple_health, ingest, retention
+
+
+def _snapshot(data_dir):
+    apple_health.clear_caches()
+    return {
+        name: (series.ts.astype(str).tolist(),
+               {field: values.tolist() for field, values in sorted(series.fields.items())})
+        for name, series in apple_health.load_metrics(data_dir).items()
+    }
+
+
+def test_archiving_a_month_keeps_load_metrics_unchanged(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    ingest.write_export(ah_dir, "2026-01-10T08-00-00", export(
+        ("body_mass", [("2026-01-09 07:00:00 +1100", 70.0), ("2026-01-10 07:00:00 +1100", 70.2)]),
+        ("dietary_energy_consumed", [("2026-01-09 00:00:00 +1100", 2100.0)]),
+    ))
+    apple_health.compact_exports(data_dir)   # one January file folded, the other still pending
+    ingest.write_export(ah_dir, "2026-01-11T08-00-00", export(
+        ("body_mass", [("2026-01-10 07:00:00 +1100", 70.4), ("2026-01-11 07:00:00 +1100", 70.6)]),
+    ))
+    # A February resend correcting a January reading must keep winning over the archive
+    ingest.write_export(ah_dir, "2026-02-01T08-00-00", export(
+        ("body_mass", [("2026-01-11 07:00:00 +1100", 71.0), ("2026-02-01 07:00:00 +1100", 71.2)]),
+    ))
+    before = _snapshot(data_dir)
+    assert before["body_mass"][1]["qty"] == [70.0, 70.4, 71.0, 71.2]
+
+    assert retention.archive_exports(data_dir, days=30, today=date(2026, 3, 15)) == 2
+
+    exports = sorted(f for f in os.listdir(ah_dir) if f.startswith("export_"))
+    assert exports == [ingest.export_filename("2026-01"), ingest.export_filename("2026-02-01T08-00-00")]
+    assert _snapshot(data_dir) == before
+
+
+def test_recent_months_are_not_archived(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    ingest.write_export(ah_dir, "2026-03-01T08-00-00", export(
+        ("body_mass", [("2026-03-01 07:00:00 +1100", 70.0)]),
+    ))
+    assert retention.archive_exports(data_dir, days=30, today=date(2026, 3, 15)) == 0
+    assert ingest.export_filename("2026-03-01T08-00-00") in os.listdir(ah_dir)
+    assert np.array_equal(apple_health.load_metrics(data_dir)["body_mass"].get("qty"), [70.0])
+
+
+def test_archive_keeps_units_workouts_and_other_keys(data_dir):
+    ah_dir = os.path.join(data_dir, "apple-health")
+    run = {"name": "Run", "start": "2026-01-09 06:00:00 +1100"}
+    walk = {"name": "Walk", "start": "2026-01-10 18:00:00 +1100"}
+    first = export(("body_mass", [("2026-01-09 07:00:00 +1100", 70.0)]))
+    first["data"].update(workouts=[run], version=1)
+    second = export(("body_mass", [("2026-01-09 07:00:00 +1100", 70.5), ("2026-01-10 07:00:00 +1100", 70.2)]))
+    second["data"].update(workouts=[run, walk], version=2)
+    ingest.write_export(ah_dir, "2026-01-10T08-00-00", first)
+    ingest.write_export(ah_dir, "2026-01-11T08-00-00", second)
+
+    assert retention.archive_exports(data_dir, days=30, today=date(2026, 3, 15)) == 2
+    with apple_health.open_export(os.path.join(ah_dir, ingest.export_filename("2026-01"))) as fh:
+        archived = json.load(fh)["data"]
+    assert archived == {
+        "metrics": [{"data": second["data"]["metrics"][0]["data"], "name": "body_mass", "units": "kg"}],
+        "workouts": [run, walk],
+        "version": 2,
+    }
+
+
+def test_consolidation_holds_locators_not_entries(data_dir, monkeypatch):
+    monkeypatch.setattr(apple_health, "_STREAM_BATCH", 1_000)
+    monkeypatch.setattr(apple_health, "_MERGE_ROWS", 10_000)
+    ah_dir = os.path.join(data_dir, "apple-health")
+    minutes = np.datetime64("2026-01-01T00:00") + np.arange(30_000)
+    rows = [(f"{str(m).replace('T', ' ')}:00 +1100", 60.0) for m in minutes]
+    ingest.write_export(ah_dir, "2026-01-10T08-00-00", export(("heart_rate", rows)))
+
+    tracemalloc.start()
+    kept = sum(len(content) for kind, _, content in apple_health.consolidate_exports(
+        ah_dir, [ingest.export_filename("2026-01-10T08-00-00")]) if kind == "entries")
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert kept == len(rows)
+    # Holding every entry at once, as a dict of winners did, peaked at ~16 MB
+    assert peak < 8 * 1024 * 1024